@@ -0,0 +1,81 @@
+import json
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).resolve().parent
+DEFAULT_TOLERANCE = 0.2
+# замеры GUI и старта идут через цикл событий Qt и от прогона к прогону гуляют на 30-40%
+GUI_TOLERANCE = 0.5
+GUI_MIN_DELTA_S = 0.05
+# мелкие абсолютные изменения - шум, а не регрессия
+MIN_DELTA_S = 0.005
+MIN_DELTA_KB = 2048
+
+
+def baseline_path(name):
+    return BASELINE_DIR / f"baseline_{name}.json"
+
+
+def add_baseline_arguments(parser, name, tolerance=DEFAULT_TOLERANCE):
+    parser.add_argument("--compare", nargs="?", const=str(baseline_path(name)), metavar="BASELINE",
+                        help=f"сравнить с базовой линией (по умолчанию {baseline_path(name).name}), "
+                             f"при регрессии - код выхода 1")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help=f"записать результаты в {baseline_path(name).name}")
+    parser.add_argument("--tolerance", type=float, default=tolerance, help="допустимое ухудшение, доля")
+
+
+def make_report(name, results, **extra):
+    return {
+        'name': name,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        **extra,
+        'results': results,
+    }
+
+
+def compare(results, baseline, keys, metrics, tolerance):
+    # metrics: имя метрики -> минимальное абсолютное ухудшение; больше значение - хуже
+    previous = {tuple(item[key] for key in keys): item for item in baseline['results']}
+    regressions = []
+    for item in results:
+        case = tuple(item[key] for key in keys)
+        before = previous.get(case)
+        if before is None:
+            continue
+        for metric, min_delta in metrics.items():
+            old, new = before.get(metric), item.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                regressions.append({'case': "/".join(map(str, case)), 'metric': metric, 'baseline': old,
+                                    'value': new, 'ratio': new / old if old else float('inf')})
+    return regressions
+
+
+def check_baseline(args, report, keys, metrics):
+    # общий конец main(): --update-baseline пишет файл, --compare печатает регрессии; возвращает код выхода
+    if args.update_baseline:
+        path = Path(args.compare) if args.compare else baseline_path(report['name'])
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding='utf-8')
+        print(f"базовая линия записана: {path}", file=sys.stderr)
+        return 0
+    if not args.compare:
+        return 0
+    path = Path(args.compare)
+    if not path.exists():
+        print(f"нет базовой линии {path}; запишите ее через --update-baseline", file=sys.stderr)
+        return 1
+    baseline = json.loads(path.read_text(encoding='utf-8'))
+    regressions = compare(report['results'], baseline, keys, metrics, args.tolerance)
+    for item in regressions:
+        print(f"регрессия: {item['case']} {item['metric']}: {item['value']} против {item['baseline']} "
+              f"({item['ratio']:.2f}x)", file=sys.stderr)
+    if not regressions:
+        print(f"регрессий относительно {path.name} нет (допуск {args.tolerance:.0%})", file=sys.stderr)
+    report['regressions'] = regressions
+    return 1 if regressions else 0
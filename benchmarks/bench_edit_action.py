@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+if not __package__:
+    # запуск файлом (python benchmarks/bench_edit_action.py): корень репозитория в sys.path, как при python -m
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QApplication, QTableWidget, QTableWidgetItem, QPushButton, QTableView
+
+from benchmarks.baseline import add_baseline_arguments, check_baseline, make_report, GUI_TOLERANCE, GUI_MIN_DELTA_S, \
+    MIN_DELTA_KB
+from gui.table_model import PagedTableModel, ButtonDelegate
+
+ROOT = Path(__file__).resolve().parent.parent
+COLUMNS = ["ID", "Название", "Описание", "Дата создания", "Действия"]
+BASELINE_METRICS = {"build_s": GUI_MIN_DELTA_S, "scroll_s": GUI_MIN_DELTA_S, "rss_delta_kb": MIN_DELTA_KB,
+                    "tracemalloc_peak_kb": MIN_DELTA_KB}
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_rows(count):
+    return [(i, (str(i), f"experiment {i}", "описание", "2025-01-01")) for i in range(1, count + 1)]
+
+
+def build_widgets(rows):
+    table = QTableWidget()
+    table.setColumnCount(len(COLUMNS))
+    table.setHorizontalHeaderLabels(COLUMNS)
+    table.setRowCount(len(rows))
+    for row, (item_id, values) in enumerate(rows):
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            item.setFlags(Qt.ItemIsEnabled)
+            table.setItem(row, column, item)
+        edit_btn = QPushButton("Редактировать")
+        edit_btn.clicked.connect(lambda checked, id=item_id: None)
+        table.setCellWidget(row, len(COLUMNS) - 1, edit_btn)
+    return table
+
+
+def build_delegate(rows):
+    def fetch_page(after_id, page_size):
+        start = after_id or 0
+        return rows[start:start + page_size]
+
+    table = QTableView()
+    model = PagedTableModel(COLUMNS, fetch_page, lambda row: row, lambda ids: [rows[i - 1] for i in ids],
+                            parent=table)
+    table.setModel(model)
+    delegate = ButtonDelegate("Редактировать", table)
+    delegate.clicked.connect(lambda row: None)
+    table.setItemDelegateForColumn(len(COLUMNS) - 1, delegate)
+    while model.canFetchMore():
+        model.fetchMore()
+    return table
+
+
+def run_variant(variant, count):
+    app = QApplication.instance() or QApplication(sys.argv)
+    rows = make_rows(count)
+    rss_before = rss_kb()
+    tracemalloc.start()
+
+    started = time.perf_counter()
+    table = build_widgets(rows) if variant == "widgets" else build_delegate(rows)
+    table.resize(1000, 600)
+    table.show()
+    app.processEvents()
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scrollbar = table.verticalScrollBar()
+    for step in range(1, 21):
+        scrollbar.setValue(scrollbar.maximum() * step // 20)
+        app.processEvents()
+    scroll_time = time.perf_counter() - started
+
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "variant": variant,
+        "rows": count,
+        "build_s": round(build_time, 4),
+        "scroll_s": round(scroll_time, 4),
+        "rss_delta_kb": rss_kb() - rss_before,
+        "tracemalloc_peak_kb": traced_peak // 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение кнопок в ячейках и делегата для колонки действий")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--variant", choices=["widgets", "delegate"])
+    add_baseline_arguments(parser, "edit_action", tolerance=GUI_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.rows[0])))
+        return
+
+    results = []
+    for count in args.rows:
+        for variant in ("widgets", "delegate"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_edit_action", "--variant", variant, "--rows", str(count)],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'variant':<10} {'rows':>8} {'build_s':>9} {'scroll_s':>9} {'rss_kb':>10} {'py_peak_kb':>11}")
+    for r in results:
+        print(f"{r['variant']:<10} {r['rows']:>8} {r['build_s']:>9} {r['scroll_s']:>9} "
+              f"{r['rss_delta_kb']:>10} {r['tracemalloc_peak_kb']:>11}")
+
+    if check_baseline(args, make_report("edit_action", results), ("variant", "rows"), BASELINE_METRICS):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
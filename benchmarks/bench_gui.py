@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+if not __package__:
+    # запуск файлом (python benchmarks/bench_gui.py): корень репозитория в sys.path, как при python -m
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QThreadPool
+from PySide6.QtWidgets import QApplication
+
+import gui.view_widget as view_widget
+from benchmarks.baseline import add_baseline_arguments, check_baseline, make_report, GUI_TOLERANCE, GUI_MIN_DELTA_S, \
+    MIN_DELTA_KB
+from db.cache import CACHE_MAX_ROWS, cached, get_cache_stats
+from db.models import AttackTypeEnum
+from db.requests import PAGE_SIZE
+from gui.table_model import MAX_CACHED_ROWS
+
+DIALOGS = ("experiments", "runs", "images")
+BASELINE_METRICS = {
+    **{name: GUI_MIN_DELTA_S for name in ("open_s", "populate_s", "scroll_s", "reload_s", "filter_attack_s",
+                                          "filter_sort_s", "filter_reset_s")},
+    "rss_delta_kb": MIN_DELTA_KB, "tracemalloc_peak_kb": MIN_DELTA_KB,
+}
+SCROLL_STEPS = 20
+IDLE_TIMEOUT_S = 120
+ROOT = Path(__file__).resolve().parent.parent
+# когда окно модели и кеш уже заполнены, RSS от числа строк почти не зависит (остаются только id в модели)
+FLAT_RSS_SLACK_KB = 8 * 1024
+
+ExperimentRow = namedtuple("ExperimentRow", "experiment_id name description created_date")
+RunRow = namedtuple("RunRow", "run_id experiment_id run_date accuracy flagged")
+ImageRow = namedtuple("ImageRow", "image_id run_id experiment_id file_path original_name added_date coordinates "
+                                  "attack_type")
+
+ATTACK_TYPES = [attack_type.value for attack_type in AttackTypeEnum]
+FILE_EXTS = (".jpg", ".png", ".jpeg")
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_experiment(i):
+    return ExperimentRow(i, f"Synthetic experiment {i:06d}", "описание эксперимента", date(2024, 1, 1))
+
+
+def make_run(i):
+    return RunRow(i, i % 1000 + 1, datetime(2024, 1, 1) + timedelta(minutes=i), 0.5 + (i % 50) / 100, i % 7 == 0)
+
+
+def make_image(i):
+    return ImageRow(i, i % 10000 + 1, i % 1000 + 1, f"/data/synthetic/run_{i % 10000 + 1}/img_{i:09d}"
+                    f"{FILE_EXTS[i % len(FILE_EXTS)]}", f"IMG_{i:05d}", datetime(2024, 1, 1) + timedelta(seconds=i),
+                    [i % 300, i % 200, i % 300 + 50, i % 200 + 50], ATTACK_TYPES[i % len(ATTACK_TYPES)])
+
+
+def paged(make_row, count):
+    def fetch_page(page_size=PAGE_SIZE, after_id=None):
+        start = (after_id or 0) + 1
+        return [make_row(i) for i in range(start, min(count, start + page_size - 1) + 1)]
+    return fetch_page
+
+
+def filtered_images(count):
+    # тот же контракт, что у get_images_filtered_page: keyset по image_id, фильтры по типу атаки и расширению
+    def matches(i, filters):
+        return ((not filters.get('attack_type') or ATTACK_TYPES[i % len(ATTACK_TYPES)] == filters['attack_type'])
+                and (not filters.get('file_type') or FILE_EXTS[i % len(FILE_EXTS)] == filters['file_type']))
+
+    def fetch_page(filters, page_size=PAGE_SIZE, after_id=None):
+        if filters.get('sort_id') == 'desc':
+            ids = range((after_id or count + 1) - 1, 0, -1)
+        else:
+            ids = range((after_id or 0) + 1, count + 1)
+        page = []
+        for i in ids:
+            if matches(i, filters):
+                page.append(make_image(i))
+                if len(page) == page_size:
+                    break
+        return page
+    return fetch_page
+
+
+def install_fake_data(count):
+    # страницы идут через тот же кеш, что и настоящие функции db.requests, - его память тоже в замерах
+    view_widget.get_experiments_page = cached('experiments')(paged(make_experiment, count))
+    view_widget.get_runs_page = cached('runs')(paged(make_run, count))
+    view_widget.get_images_filtered_page = cached('images', 'runs')(filtered_images(count))
+    # вытесненные из окна модели строки перечитываются по id
+    view_widget.get_experiments_by_ids = lambda ids: [make_experiment(i) for i in ids]
+    view_widget.get_runs_by_ids = lambda ids: [make_run(i) for i in ids]
+    view_widget.get_images_by_ids = lambda ids, filters: [make_image(i) for i in ids]
+
+
+def wait_idle(app, dialog):
+    deadline = time.perf_counter() + IDLE_TIMEOUT_S
+    while dialog.runner.is_busy() or dialog.model.is_loading():
+        QThreadPool.globalInstance().waitForDone(5)
+        app.processEvents()
+        if time.perf_counter() > deadline:
+            raise TimeoutError("страница не загрузилась")
+
+
+def fetch_all(app, dialog):
+    while dialog.model.canFetchMore():
+        dialog.model.fetchMore()
+        wait_idle(app, dialog)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def scroll(app, dialog):
+    scrollbar = dialog.table.verticalScrollBar()
+    latencies = []
+    for step in range(1, SCROLL_STEPS + 1):
+        started = time.perf_counter()
+        scrollbar.setValue(scrollbar.maximum() * step // SCROLL_STEPS)
+        app.processEvents()
+        latencies.append(time.perf_counter() - started)
+    return sum(latencies), max(latencies)
+
+
+def run_dialog(name, count):
+    app = QApplication.instance() or QApplication(sys.argv)
+    install_fake_data(count)
+    dialog_class = {"experiments": view_widget.ExperimentsTableDialog, "runs": view_widget.RunsTableDialog,
+                    "images": view_widget.ImagesTableDialog}[name]
+
+    rss_before = rss_kb()
+    tracemalloc.start()
+    result = {"dialog": name, "rows": count}
+
+    def open_dialog():
+        result["_dialog"] = dialog_class()
+        result["_dialog"].resize(1200, 700)
+        result["_dialog"].show()
+        wait_idle(app, result["_dialog"])
+        app.processEvents()
+
+    result["open_s"] = timed(open_dialog)
+    dialog = result.pop("_dialog")
+    result["populate_s"] = timed(lambda: fetch_all(app, dialog))
+    rss_populated = rss_kb()
+    result["scroll_s"], result["scroll_max_step_s"] = scroll(app, dialog)
+    # второй проход по тем же строкам: окно модели и кеш уже заполнены, память расти не должна
+    dialog.table.verticalScrollBar().setValue(0)
+    app.processEvents()
+    scroll(app, dialog)
+    wait_idle(app, dialog)
+    result["scroll_rss_growth_kb"] = rss_kb() - rss_populated
+    result["cache_rows"] = get_cache_stats()['rows']
+    result["reload_s"] = timed(lambda: (dialog.load_data(), wait_idle(app, dialog), fetch_all(app, dialog)))
+
+    if name == "images":
+        # время включает задержку FILTER_DEBOUNCE_MS перед запросом
+        def change_filter(combo, index):
+            combo.setCurrentIndex(index)
+            while dialog.filter_timer.isActive():
+                app.processEvents()
+                time.sleep(0.001)
+            wait_idle(app, dialog)
+            app.processEvents()
+
+        result["filter_attack_s"] = timed(lambda: change_filter(dialog.attack_type_combo, 2))
+        result["filter_sort_s"] = timed(lambda: change_filter(dialog.sort_id_combo, 2))
+        result["filter_reset_s"] = timed(lambda: (dialog.reset_filters(), wait_idle(app, dialog), app.processEvents()))
+
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["loaded_rows"] = dialog.model.rowCount()
+    result["rss_delta_kb"] = rss_kb() - rss_before
+    result["peak_rss_kb"] = peak_rss_kb()
+    result["tracemalloc_peak_kb"] = traced_peak // 1024
+    dialog.close()
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время открытия и заполнения таблиц просмотра на синтетических данных")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dialog", choices=DIALOGS, nargs="+", default=list(DIALOGS))
+    parser.add_argument("--output", help="куда записать результаты (json)")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    add_baseline_arguments(parser, "gui", tolerance=GUI_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_dialog(args.dialog[0], args.rows[0])))
+        return
+
+    # каждый замер в отдельном процессе, чтобы RSS не копился между диалогами
+    results = []
+    for count in args.rows:
+        for name in args.dialog:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_gui", "--single", "--dialog", name, "--rows", str(count)],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'dialog':<12} {'rows':>8} {'open_s':>8} {'fill_s':>8} {'scroll_s':>9} {'reload_s':>9} "
+          f"{'filter_s':>9} {'rss_kb':>9} {'py_peak_kb':>11} {'cache_rows':>11}")
+    for r in results:
+        print(f"{r['dialog']:<12} {r['rows']:>8} {r['open_s']:>8} {r['populate_s']:>8} {r['scroll_s']:>9} "
+              f"{r['reload_s']:>9} {r.get('filter_attack_s', '-'):>9} {r['rss_delta_kb']:>9} "
+              f"{r['tracemalloc_peak_kb']:>11} {r['cache_rows']:>11}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failures = check_flat_memory(results)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    status = check_baseline(args, make_report("gui", results), ("dialog", "rows"), BASELINE_METRICS)
+    if failures or status:
+        sys.exit(1)
+
+
+def check_flat_memory(results):
+    failures = []
+    for name in {r['dialog'] for r in results}:
+        runs = sorted((r for r in results if r['dialog'] == name), key=lambda r: r['rows'])
+        for r in runs:
+            if r['cache_rows'] > CACHE_MAX_ROWS:
+                failures.append(f"{name} @ {r['rows']}: в кеше {r['cache_rows']} строк, предел {CACHE_MAX_ROWS}")
+        runs = [r for r in runs if r['rows'] >= MAX_CACHED_ROWS]
+        if len(runs) < 2:
+            continue
+        growth = runs[-1]['rss_delta_kb'] - runs[0]['rss_delta_kb']
+        if growth > FLAT_RSS_SLACK_KB:
+            failures.append(f"{name}: память растет с числом строк: +{growth} КБ от {runs[0]['rows']} "
+                            f"до {runs[-1]['rows']} строк")
+    return failures
+
+
+if __name__ == "__main__":
+    main()
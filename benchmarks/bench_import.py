@@ -0,0 +1,117 @@
+import argparse
+import csv
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+if not __package__:
+    # запуск файлом (python benchmarks/bench_import.py): корень репозитория в sys.path, как при python -m
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_requests import temporary_instance, _existing_instance, _non_empty_tables
+from db.database import perform_connection, perform_recreate_tables
+from db.generator import generate_dataset
+from db.importer import IMPORT_CHUNK_SIZE, MANIFEST_FIELDS, _read_csv, _read_jsonl, _staged_chunks, \
+    import_images_manifest
+from db.models import AttackTypeEnum
+
+TARGET_ROWS_PER_S = 50000
+RUNS = 1000
+ATTACK_TYPES = [attack_type.value for attack_type in AttackTypeEnum]
+
+
+def make_row(i, rng, bad_share):
+    row = {'run_id': rng.randrange(1, RUNS + 1), 'file_path': f"/bench/import/{i // 1000}/img_{i:09d}.png",
+           'original_name': f"IMG_{i:06d}", 'attack_type': rng.choice(ATTACK_TYPES),
+           'coordinates': [rng.randrange(640), rng.randrange(480), 64, 64]}
+    if rng.random() < bad_share:
+        # по одной ошибке каждого вида, которые проверяет REJECT_INVALID_SQL
+        field, value = rng.choice((('run_id', RUNS + 1), ('attack_type', 'unknown'), ('file_path', ' '),
+                                   ('coordinates', 'a,b')))
+        row[field] = value
+    return row
+
+
+def write_manifest(path, rows, seed, bad_share):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if path.suffix == '.csv':
+            writer = csv.writer(f)
+            writer.writerow(MANIFEST_FIELDS)
+            for i in range(rows):
+                row = make_row(i, rng, bad_share)
+                coordinates = row['coordinates']
+                if isinstance(coordinates, list):
+                    coordinates = ";".join(map(str, coordinates))
+                writer.writerow((row['run_id'], row['file_path'], row['original_name'], row['attack_type'],
+                                 coordinates))
+        else:
+            for i in range(rows):
+                f.write(json.dumps(make_row(i, rng, bad_share)))
+                f.write('\n')
+
+
+def stage_only(path):
+    # клиентская часть импорта без базы: разбор файла и подготовка csv для COPY
+    rows = _read_csv(path) if path.suffix == '.csv' else _read_jsonl(path)
+    started = time.perf_counter()
+    staged = sum(accepted for _, _, accepted, _ in _staged_chunks(rows, IMPORT_CHUNK_SIZE))
+    return staged, time.perf_counter() - started
+
+
+def full_import(path, params, use_env_db):
+    if not perform_connection(params, check_schema=False):
+        raise SystemExit(1)
+    if use_env_db and _non_empty_tables():
+        raise SystemExit("в базе из .env есть данные, бенчмарк их удалит; запустите без --use-env-db")
+    if not perform_recreate_tables():
+        raise SystemExit(1)
+    generate_dataset(experiments=10, runs=RUNS, images=0)
+    started = time.perf_counter()
+    result = import_images_manifest(path, rejects_path=path.with_suffix('.rejected.jsonl'))
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость импорта манифеста изображений")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--format", choices=("csv", "jsonl"), nargs="+", default=["csv", "jsonl"])
+    parser.add_argument("--bad-share", type=float, default=0.01, help="доля некорректных строк")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--client-only", action="store_true", help="только разбор файла, без базы")
+    parser.add_argument("--use-env-db", action="store_true",
+                        help="использовать базу из .env; только пустую, таблицы будут пересозданы")
+    parser.add_argument("--target", type=float, default=TARGET_ROWS_PER_S, help="ожидаемая скорость, строк/с")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_import_") as workdir:
+        for fmt in args.format:
+            path = Path(workdir) / f"manifest.{fmt}"
+            write_manifest(path, args.rows, args.seed, args.bad_share)
+            staged, stage_s = stage_only(path)
+            result = {'format': fmt, 'rows': args.rows, 'staged': staged, 'stage_s': stage_s,
+                      'stage_rows_per_s': args.rows / stage_s}
+            if not args.client_only:
+                with (_existing_instance() if args.use_env_db else temporary_instance()) as params:
+                    imported, import_s = full_import(path, params, args.use_env_db)
+                result.update(inserted=imported['inserted'], rejected=imported['rejected'], import_s=import_s,
+                              import_rows_per_s=args.rows / import_s)
+            results.append(result)
+            print(f"{fmt:<6} {args.rows:>9} строк: разбор {result['stage_rows_per_s']:>10.0f} строк/с"
+                  + (f", импорт {result['import_rows_per_s']:>10.0f} строк/с "
+                     f"(добавлено {result['inserted']}, отклонено {result['rejected']})"
+                     if 'import_s' in result else ""), file=sys.stderr)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    key = 'stage_rows_per_s' if args.client_only else 'import_rows_per_s'
+    if any(result[key] < args.target for result in results):
+        print(f"скорость ниже {args.target:.0f} строк/с", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
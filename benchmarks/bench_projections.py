@@ -0,0 +1,86 @@
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+if not __package__:
+    # запуск файлом (python benchmarks/bench_projections.py): корень репозитория в sys.path, как при python -m
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select, asc
+
+import db.database
+from benchmarks.baseline import add_baseline_arguments, check_baseline, make_report, MIN_DELTA_S
+from db.config import get_settings
+from db.database import perform_connection
+from db.models import Image, Run
+from db.requests import IMAGE_COLUMNS
+
+BASELINE_METRICS = {"time_s": MIN_DELTA_S, "held_mb": 2, "peak_mb": 2}
+
+
+def orm_listing(session, limit):
+    query = (select(Image, Run.experiment_id).join(Run, Image.run_id == Run.run_id)
+             .order_by(asc(Image.image_id)).limit(limit))
+    images = []
+    for image, experiment_id in session.execute(query):
+        setattr(image, 'experiment_id', experiment_id)
+        images.append(image)
+    return images
+
+
+def projection_listing(session, limit):
+    query = (select(*IMAGE_COLUMNS).join(Run, Image.run_id == Run.run_id)
+             .order_by(asc(Image.image_id)).limit(limit))
+    return session.execute(query).all()
+
+
+def measure(listing, limit):
+    gc.collect()
+    with db.database.SessionLocal() as session:
+        tracemalloc.start()
+        started = time.perf_counter()
+        rows = listing(session, limit)
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        count = len(rows)
+    return count, elapsed, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Гидратация ORM-объектов против Core-проекций для списка изображений")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    add_baseline_arguments(parser, "projections")
+    args = parser.parse_args()
+
+    if not perform_connection(get_settings().model_dump()):
+        raise SystemExit(1)
+
+    results = []
+    print(f"{'listing':<12} {'rows':>8} {'time_s':>8} {'held_mb':>8} {'peak_mb':>8} {'s/100k':>8} {'mb/100k':>8}")
+    for name, listing in (("orm", orm_listing), ("projection", projection_listing)):
+        best = None
+        for _ in range(args.repeat):
+            result = measure(listing, args.rows)
+            if best is None or result[1] < best[1]:
+                best = result
+        count, elapsed, current, peak = best
+        if not count:
+            print("таблица images пуста - сначала загрузите данные")
+            return
+        scale = 100000 / count
+        print(f"{name:<12} {count:>8} {elapsed:>8.3f} {current / 2**20:>8.1f} {peak / 2**20:>8.1f} "
+              f"{elapsed * scale:>8.3f} {current / 2**20 * scale:>8.1f}")
+        results.append({"listing": name, "rows": count, "time_s": round(elapsed, 4),
+                         "held_mb": round(current / 2**20, 1), "peak_mb": round(peak / 2**20, 1)})
+
+    if check_baseline(args, make_report("projections", results), ("listing", "rows"), BASELINE_METRICS):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
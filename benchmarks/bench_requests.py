@@ -0,0 +1,187 @@
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import product
+from pathlib import Path
+
+if not __package__:
+    # запуск файлом (python benchmarks/bench_requests.py): корень репозитория в sys.path, как при python -m
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import inspect, literal, select
+
+import db.database
+from benchmarks.baseline import add_baseline_arguments, check_baseline, make_report, MIN_DELTA_S
+from db.cache import set_cache_limits
+from db.config import get_settings
+from db.database import Base, perform_connection, perform_recreate_tables
+from db.generator import generate_dataset
+from db.requests import (create_images_bulk, delete_images, get_image_by_id, update_image, update_images_bulk,
+                         get_images_filtered_page, get_all_images_filtered, get_experiments_page, get_runs_page,
+                         get_stats)
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+POINT_LOOKUPS = 200
+BULK_ROWS = 1000
+
+FILTER_COMBINATIONS = [
+    {'attack_type': attack_type, 'file_type': file_type, 'sort_id': sort_id}
+    for attack_type, file_type, sort_id in product((None, 'blur'), (None, '.png'), ('asc', 'desc'))
+]
+
+
+def _pg_binary(name):
+    path = shutil.which(name)
+    if path:
+        return path
+    candidates = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"))
+    if not candidates:
+        raise SystemExit(f"не найден {name}: установите PostgreSQL или укажите пустую базу из .env через --use-env-db")
+    return candidates[-1]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def temporary_instance():
+    # одноразовый кластер во временном каталоге, удаляется после прогона
+    workdir = tempfile.mkdtemp(prefix="bench_pg_")
+    data_dir = os.path.join(workdir, "data")
+    port = _free_port()
+    subprocess.run([_pg_binary("initdb"), "-D", data_dir, "-U", "bench", "--auth=trust", "-E", "UTF8"],
+                   check=True, capture_output=True)
+    subprocess.run([_pg_binary("pg_ctl"), "-D", data_dir, "-l", os.path.join(workdir, "server.log"), "-w",
+                    "-o", f"-p {port} -k {workdir} -c listen_addresses=127.0.0.1 -c fsync=off "
+                          f"-c synchronous_commit=off -c full_page_writes=off", "start"],
+                   check=True, capture_output=True)
+    try:
+        yield {'DB_USER': 'bench', 'DB_PASSWORD': '', 'DB_HOST': '127.0.0.1', 'DB_PORT': port,
+               'DB_NAME': 'postgres'}
+    finally:
+        subprocess.run([_pg_binary("pg_ctl"), "-D", data_dir, "-m", "fast", "stop"], capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def _existing_instance():
+    yield get_settings().model_dump()
+
+
+def _non_empty_tables():
+    engine = db.database.engine
+    existing = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        return [table.name for table in Base.metadata.sorted_tables if table.name in existing
+                and conn.execute(select(literal(1)).select_from(table).limit(1)).first() is not None]
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {'median_s': statistics.median(timings), 'min_s': min(timings), 'max_s': max(timings)}
+
+
+def filter_name(filters):
+    return ",".join(f"{key}={value}" for key, value in filters.items() if value) or "none"
+
+
+def build_cases(size, rng):
+    ids = [rng.randrange(1, size + 1) for _ in range(POINT_LOOKUPS)]
+    run_id = 1
+    batch = iter(range(10 ** 9))
+
+    def create_and_delete():
+        number = next(batch)
+        rows = [{'run_id': run_id, 'file_path': f"/bench/{size}/{number}/img_{i}.png", 'attack_type': 'blur'}
+                for i in range(BULK_ROWS)]
+        delete_images(create_images_bulk(rows))
+
+    cases = {
+        'create_images_bulk+delete_images': create_and_delete,
+        'get_image_by_id': lambda: [get_image_by_id(image_id) for image_id in ids],
+        'update_image': lambda: [update_image(image_id, run_id, 'noise') for image_id in ids[:50]],
+        'update_images_bulk': lambda: update_images_bulk({'attack_type': 'other'}, ids=ids),
+        'get_experiments_page': lambda: get_experiments_page(),
+        'get_runs_page': lambda: get_runs_page(),
+        'get_stats': lambda: get_stats(),
+    }
+    for filters in FILTER_COMBINATIONS:
+        cases[f"get_images_filtered_page[{filter_name(filters)}]"] = lambda f=filters: get_images_filtered_page(f)
+        cases[f"get_all_images_filtered[{filter_name(filters)}]"] = lambda f=filters: get_all_images_filtered(f)
+    return cases
+
+
+def run_size(size, repeat, seed, only):
+    if not perform_recreate_tables():
+        raise SystemExit(1)
+    started = time.perf_counter()
+    generate_dataset(experiments=max(size // 1000, 1), runs=max(size // 10, 1), images=size, seed=seed)
+    load_s = time.perf_counter() - started
+    print(f"{size}: данные загружены за {load_s:.1f} с", file=sys.stderr)
+
+    results = [{'name': 'generate_dataset', 'size': size, 'median_s': load_s, 'min_s': load_s, 'max_s': load_s}]
+    for name, fn in build_cases(size, random.Random(seed)).items():
+        if only and only not in name:
+            continue
+        result = measure(fn, repeat)
+        results.append({'name': name, 'size': size, **result})
+        print(f"{size:>9} {name:<70} {result['median_s'] * 1000:>10.1f} мс", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк функций db.requests")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="количество изображений через запятую")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="запускать только случаи, в названии которых есть подстрока")
+    parser.add_argument("--output", help="куда записать результаты (json)")
+    add_baseline_arguments(parser, "requests")
+    # по умолчанию - временный кластер через initdb/pg_ctl: прогон пересоздает таблицы
+    parser.add_argument("--use-env-db", action="store_true",
+                        help="использовать базу из .env; только пустую, таблицы будут пересозданы")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    # кеш выключен, иначе повторы измеряют словарь, а не базу
+    set_cache_limits(max_entries=0)
+
+    with (_existing_instance() if args.use_env_db else temporary_instance()) as params:
+        if not perform_connection(params, check_schema=False):
+            raise SystemExit(1)
+        if args.use_env_db:
+            non_empty = _non_empty_tables()
+            if non_empty:
+                raise SystemExit(f"в базе из .env есть данные ({', '.join(non_empty)}), бенчмарк их удалит; "
+                                 f"запустите без --use-env-db")
+        results = [item for size in sizes for item in run_size(size, args.repeat, args.seed, args.only)]
+
+    report = make_report("requests", results, repeat=args.repeat, seed=args.seed)
+    status = check_baseline(args, report, ('name', 'size'), {'median_s': MIN_DELTA_S})
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding='utf-8')
+    else:
+        print(text)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
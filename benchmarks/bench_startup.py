@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+if not __package__:
+    # запуск файлом (python benchmarks/bench_startup.py): корень репозитория в sys.path, как при python -m
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.baseline import add_baseline_arguments, check_baseline, make_report, GUI_TOLERANCE, GUI_MIN_DELTA_S
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FIRST_WINDOW_SNIPPET = """
+import sys
+from PySide6.QtWidgets import QApplication
+app = QApplication(sys.argv)
+import main
+window = main.create_main_window()
+app.processEvents()
+import json
+print(json.dumps({"modules": sorted(sys.modules)}))
+"""
+
+FORBIDDEN_MODULES = ("sqlalchemy", "pydantic", "pydantic_settings", "psycopg2", "db",
+                     "gui.add_widget", "gui.view_widget")
+# легкие модули без зависимостей, которые нужны JobRunner уже в первом окне
+ALLOWED_MODULES = ("db", "db.cancel")
+
+
+def parse_importtime(stderr):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # вложенные импорты отмечены отступом - оставляем только импорты верхнего уровня
+        if not name[1:].startswith(" "):
+            imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def run_once():
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", FIRST_WINDOW_SNIPPET],
+                               cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    modules = json.loads(completed.stdout.strip().splitlines()[-1])["modules"]
+    return elapsed, modules, parse_importtime(completed.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время до первого окна и импортируемые при старте модули")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="допустимое время до первого окна, с")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true")
+    add_baseline_arguments(parser, "startup", tolerance=GUI_TOLERANCE)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+    best_time = min(elapsed for elapsed, _, _ in runs)
+    _, modules, imports = runs[0]
+    forbidden = sorted(m for m in modules if m not in ALLOWED_MODULES and (
+        m in FORBIDDEN_MODULES or m.startswith(tuple(f + "." for f in FORBIDDEN_MODULES))))
+    top = sorted(imports, key=lambda item: item[2], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({"first_window_s": best_time, "budget_s": args.budget, "forbidden": forbidden,
+                          "top_imports": [{"module": n, "cumulative_us": c} for n, _, c in top]}, indent=2))
+    else:
+        print(f"время до первого окна: {best_time:.3f} с (лимит {args.budget:.3f} с)")
+        print("самые тяжелые импорты верхнего уровня:")
+        for name, _, cumulative in top:
+            print(f"  {cumulative / 1000:>8.1f} мс  {name}")
+        if forbidden:
+            print("модули, которые не должны загружаться до первого окна:", ", ".join(forbidden))
+
+    report = make_report("startup", [{"stage": "first_window", "time_s": round(best_time, 4)}], repeat=args.repeat)
+    status = check_baseline(args, report, ("stage",), {"time_s": GUI_MIN_DELTA_S})
+    if forbidden or best_time > args.budget or status:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import json
+import logging
+import sys
+
+from db.config import get_settings
+from db.database import perform_connection, perform_recreate_tables, perform_schema_upgrade, SchemaOutdated
+from db.models import AttackTypeEnum
+
+
+def print_progress(value):
+    print(f"\r{value}", end="", file=sys.stderr, flush=True)
+
+
+def cmd_recreate(args):
+    from db.requests import insert_test_data
+
+    if not perform_recreate_tables():
+        return 1
+    if args.test_data:
+        insert_test_data()
+    return 0
+
+
+def cmd_upgrade(args):
+    return 0 if perform_schema_upgrade() else 1
+
+
+def cmd_import(args):
+    from db.importer import import_images_manifest, IMPORT_CHUNK_SIZE
+
+    result = import_images_manifest(args.manifest, rejects_path=args.rejects,
+                                    chunk_size=args.chunk_size or IMPORT_CHUNK_SIZE, progress=print_progress)
+    print(file=sys.stderr)
+    print(json.dumps(result, ensure_ascii=False))
+    return 0 if not result['rejected'] else 2
+
+
+def cmd_export(args):
+    from db.exporter import export_experiments, export_runs, export_images
+
+    if args.table == 'images':
+        filters = {'attack_type': args.attack_type, 'file_type': args.file_type, 'sort_id': args.sort}
+        written = export_images(args.path, args.format, filters=filters, progress=print_progress)
+    elif args.table == 'runs':
+        written = export_runs(args.path, args.format, progress=print_progress)
+    else:
+        written = export_experiments(args.path, args.format, progress=print_progress)
+    print(file=sys.stderr)
+    print(json.dumps({'table': args.table, 'rows': written, 'path': args.path}, ensure_ascii=False))
+    return 0
+
+
+def cmd_generate(args):
+    from db.generator import generate_dataset
+
+    counts = generate_dataset(args.experiments, args.runs, args.images, seed=args.seed, truncate=args.truncate,
+                              progress=print_progress)
+    print(file=sys.stderr)
+    print(json.dumps(counts, ensure_ascii=False))
+    return 0
+
+
+def cmd_stats(args):
+    from db.requests import get_stats
+
+    print(json.dumps(get_stats(), ensure_ascii=False, indent=2, default=str))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Работа с базой данных без графического интерфейса")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recreate = commands.add_parser("recreate", help="пересоздать таблицы")
+    recreate.add_argument("--test-data", action="store_true", help="внести тестовые данные")
+    recreate.set_defaults(handler=cmd_recreate)
+
+    upgrade = commands.add_parser("upgrade", help="обновить схему: новые колонки и индексы (CONCURRENTLY)")
+    upgrade.set_defaults(handler=cmd_upgrade)
+
+    manifest = commands.add_parser("import", help="импорт манифеста изображений (csv/jsonl)")
+    manifest.add_argument("manifest")
+    manifest.add_argument("--rejects", help="файл для отклоненных строк")
+    manifest.add_argument("--chunk-size", type=int)
+    manifest.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="экспорт таблицы в csv/jsonl")
+    export.add_argument("table", choices=["experiments", "runs", "images"])
+    export.add_argument("path")
+    export.add_argument("--format", choices=["csv", "jsonl"])
+    export.add_argument("--attack-type", choices=[attack_type.value for attack_type in AttackTypeEnum])
+    export.add_argument("--file-type")
+    export.add_argument("--sort", choices=["asc", "desc"])
+    export.set_defaults(handler=cmd_export)
+
+    generate = commands.add_parser("generate", help="сгенерировать синтетические данные для нагрузочных тестов")
+    generate.add_argument("--experiments", type=int, default=1000)
+    generate.add_argument("--runs", type=int, default=100000)
+    generate.add_argument("--images", type=int, default=1000000)
+    generate.add_argument("--seed", type=int, default=42)
+    generate.add_argument("--truncate", action="store_true", help="очистить таблицы перед загрузкой")
+    generate.set_defaults(handler=cmd_generate)
+
+    stats = commands.add_parser("stats", help="сводная статистика")
+    stats.set_defaults(handler=cmd_stats)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # stdout занят результатом (json), сообщения - в stderr
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        # upgrade и recreate как раз приводят схему в порядок, им устаревшая схема не мешает
+        if not perform_connection(get_settings().model_dump(), check_schema=args.command not in ('upgrade', 'recreate')):
+            return 1
+    except SchemaOutdated as exc:
+        logging.error(str(exc))
+        return 1
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
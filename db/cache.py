@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+CACHE_MAX_ENTRIES = 256
+# предел по строкам, как у окна PagedTableModel: страница весит PAGE_SIZE строк,
+# а полный список без фильтров - всю таблицу
+CACHE_MAX_ROWS = 5000
+CACHE_TTL_SECONDS = 60.0
+
+_lock = threading.RLock()
+_entries = OrderedDict()
+_versions = {}
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'oversized': 0}
+_limits = {'max_entries': CACHE_MAX_ENTRIES, 'max_rows': CACHE_MAX_ROWS, 'ttl': CACHE_TTL_SECONDS}
+_size = {'rows': 0}
+# таблицы, измененные внутри незакоммиченной транзакции (см. db.database.unit_of_work)
+_pending = ContextVar('cache_pending', default=None)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _table_versions(tables):
+    return tuple(_versions.get(table, 0) for table in ('*',) + tables)
+
+
+def _rows(value):
+    return len(value) if isinstance(value, list) else 1
+
+
+def _remove(key):
+    entry = _entries.pop(key)
+    _size['rows'] -= entry[3]
+
+
+def _evict():
+    while _entries and (len(_entries) > _limits['max_entries'] or _size['rows'] > _limits['max_rows']):
+        _remove(next(iter(_entries)))
+        _stats['evictions'] += 1
+
+
+def cached(*tables):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # внутри транзакции видны незакоммиченные данные - их нельзя отдавать другим потокам
+            if _pending.get() is not None:
+                return func(*args, **kwargs)
+            key = (func.__qualname__, _freeze(args), _freeze(kwargs))
+            now = time.monotonic()
+            with _lock:
+                entry = _entries.get(key)
+                if entry is not None and entry[0] > now:
+                    _entries.move_to_end(key)
+                    _stats['hits'] += 1
+                    return entry[2]
+                if entry is not None:
+                    _remove(key)
+                _stats['misses'] += 1
+                versions = _table_versions(tables)
+
+            value = func(*args, **kwargs)
+            rows = _rows(value)
+
+            with _lock:
+                if rows > _limits['max_rows']:
+                    # результат больше всего кеша вытеснил бы все остальное - не храним его
+                    _stats['oversized'] += 1
+                # пока шел запрос, таблицу могли изменить - такой результат не кешируем
+                elif versions == _table_versions(tables):
+                    if key in _entries:
+                        _remove(key)
+                    _entries[key] = (now + _limits['ttl'], tables, value, rows)
+                    _size['rows'] += rows
+                    _evict()
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidate(*tables):
+    pending = _pending.get()
+    if pending is not None:
+        pending.update(tables)
+        return
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+        stale = [key for key, entry in _entries.items() if set(entry[1]) & set(tables)]
+        for key in stale:
+            _remove(key)
+        _stats['invalidations'] += len(stale)
+
+
+def invalidates(*tables):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            invalidate(*tables)
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def deferred_invalidation():
+    if _pending.get() is not None:
+        yield
+        return
+    tables = set()
+    token = _pending.set(tables)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        if tables:
+            invalidate(*tables)
+
+
+def clear_cache():
+    with _lock:
+        _versions['*'] = _versions.get('*', 0) + 1
+        _stats['invalidations'] += len(_entries)
+        _entries.clear()
+        _size['rows'] = 0
+
+
+def set_cache_limits(max_entries=None, max_rows=None, ttl=None):
+    with _lock:
+        if max_entries is not None:
+            _limits['max_entries'] = max_entries
+        if max_rows is not None:
+            _limits['max_rows'] = max_rows
+        if ttl is not None:
+            _limits['ttl'] = ttl
+        _evict()
+
+
+def get_cache_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_entries)
+        stats['rows'] = _size['rows']
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
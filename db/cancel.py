@@ -0,0 +1,69 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class QueryCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    # отмена выполняющегося запроса из другого потока через psycopg2 connection.cancel()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel_done = threading.Condition(self._lock)
+        self._connection = None
+        self._cancelling = False
+        self.cancelled = False
+
+    def cancel(self):
+        # вызывается из GUI: флаг ставится сразу, а сетевой запрос отмены уходит из отдельного потока без блокировки
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            connection = self._connection
+            if connection is None:
+                return
+            self._cancelling = True
+        threading.Thread(target=self._send_cancel, args=(connection,), name="db-cancel", daemon=True).start()
+
+    def _send_cancel(self, connection):
+        try:
+            connection.cancel()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._cancelling = False
+                self._cancel_done.notify_all()
+
+    def bind(self, connection):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("запрос отменен")
+            previous, self._connection = self._connection, connection
+            return previous
+
+    def unbind(self, previous=None):
+        with self._lock:
+            # пока идет отмена, соединение не возвращается в пул: иначе она прервала бы чужой запрос
+            while self._cancelling:
+                self._cancel_done.wait()
+            self._connection = previous
+
+
+_current_token = ContextVar('cancel_token', default=None)
+
+
+def current_cancel_token():
+    return _current_token.get()
+
+
+@contextmanager
+def cancel_scope(token):
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
@@ -1,8 +1,24 @@
+from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-class Settings(BaseSettings):
+
+class EngineOptions(BaseModel):
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DB_APPLICATION_NAME: str = "db_kr_1"
+    DB_ECHO: Literal["off", "info", "debug"] = "off"
+    DB_PGBOUNCER: bool = False
+    DB_SLOW_QUERY_MS: int = 500
+
+
+class Settings(EngineOptions, BaseSettings):
     DB_USER: str
     DB_PASSWORD: str
     DB_HOST: str
@@ -18,5 +34,16 @@ class Settings(BaseSettings):
         return (f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@"
                 f"{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}")
 
+    def engine_options(self):
+        return EngineOptions(**{name: getattr(self, name) for name in EngineOptions.model_fields})
+
+
+@lru_cache(maxsize=1)
+def get_settings():
+    return Settings()
+
 
-settings = Settings()
+def __getattr__(name):
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
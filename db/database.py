@@ -1,41 +1,177 @@
-from sqlalchemy import create_engine, text
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, text, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db.cache import clear_cache, deferred_invalidation
+from db.config import EngineOptions
+from db.instrumentation import install_query_timing
+from db.notifications import install_notify_triggers
 
+logger = logging.getLogger(__name__)
 
+ECHO_LEVELS = {"off": False, "info": True, "debug": "debug"}
 
 Base = declarative_base()
 engine = None
 SessionLocal = None
+_current_session = ContextVar('current_session', default=None)
+
+
+def get_engine_options(params):
+    return EngineOptions(**{name: value for name, value in params.items()
+                            if name in EngineOptions.model_fields and value not in (None, '')})
+
+
+def _install_pool_metrics(new_engine):
+    # счетчики свои у каждого движка: после переподключения старые слушатели не пишут в новые
+    pool_metrics = new_engine.pool_metrics = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'invalidations': 0}
+
+    @event.listens_for(new_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics['connects'] += 1
+
+    @event.listens_for(new_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics['checkouts'] += 1
+
+    @event.listens_for(new_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        pool_metrics['checkins'] += 1
+
+    @event.listens_for(new_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics['invalidations'] += 1
+
+
+def build_engine(url, options):
+    connect_args = {'application_name': options.DB_APPLICATION_NAME}
+    engine_kwargs = {
+        'echo': ECHO_LEVELS[options.DB_ECHO],
+        'pool_pre_ping': options.DB_POOL_PRE_PING,
+        'connect_args': connect_args,
+    }
+    if options.DB_PGBOUNCER:
+        engine_kwargs['poolclass'] = NullPool
+    else:
+        engine_kwargs.update(pool_size=options.DB_POOL_SIZE, max_overflow=options.DB_MAX_OVERFLOW,
+                             pool_recycle=options.DB_POOL_RECYCLE)
+        if options.DB_STATEMENT_TIMEOUT_MS:
+            connect_args['options'] = f"-c statement_timeout={options.DB_STATEMENT_TIMEOUT_MS}"
+
+    new_engine = create_engine(url, **engine_kwargs)
+    new_engine.engine_options = options
+
+    if options.DB_PGBOUNCER and options.DB_STATEMENT_TIMEOUT_MS:
+        # pgbouncer в режиме transaction pooling не пропускает startup options, поэтому таймаут
+        # выставляется в начале каждой транзакции: SET LOCAL действует только до ее конца
+        @event.listens_for(new_engine, "begin")
+        def set_statement_timeout(conn):
+            with conn.connection.dbapi_connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL statement_timeout = {int(options.DB_STATEMENT_TIMEOUT_MS)}")
+
+    _install_pool_metrics(new_engine)
+    install_query_timing(new_engine, options.DB_SLOW_QUERY_MS)
+    return new_engine
+
 
-def perform_connection(params):
+def get_pool_stats():
+    if engine is None:
+        return {}
+    stats = dict(engine.pool_metrics)
+    stats['status'] = engine.pool.status()
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(engine.pool, name):
+            stats[name] = getattr(engine.pool, name)()
+    return stats
+
+
+def current_session():
+    return _current_session.get()
+
+
+@contextmanager
+def unit_of_work():
+    # одна сессия и одна транзакция на несколько вызовов db.requests; вложенный вызов присоединяется к внешнему
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+    with deferred_invalidation(), SessionLocal() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            _current_session.reset(token)
+
+
+class SchemaOutdated(Exception):
+    pass
+
+
+def perform_connection(params, check_schema=True):
     global engine, SessionLocal
     DATABASE_URL = f"postgresql://{params['DB_USER']}:{params['DB_PASSWORD']}@{params['DB_HOST']}:{params['DB_PORT']}/{params['DB_NAME']}"
 
-    engine = create_engine(DATABASE_URL, echo=True)
+    new_engine = build_engine(DATABASE_URL, get_engine_options(params))
     try:
-        with engine.connect() as conn:
+        with new_engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-            print("Подключение к базе данных успешно")
+            logger.info("Подключение к базе данных успешно")
     except Exception as exc:
-        print("Ошибка при подключении к базе данных:", repr(exc))
-
+        logger.error(f"Ошибка при подключении к базе данных: {exc!r}")
+        new_engine.dispose()
         return False
+    if check_schema:
+        # схема сама не обновляется: ALTER, индексы и триггеры на больших таблицах - отдельный явный шаг
+        from db.models import schema_upgrades_pending
+        pending = schema_upgrades_pending(new_engine)
+        if pending:
+            new_engine.dispose()
+            raise SchemaOutdated(f"схема базы данных устарела (нет: {', '.join(pending)}); "
+                                 f"выполните: python cli.py upgrade")
+    # соединения прежнего движка закрываются, занятые сейчас - по возвращении в пул
+    if engine is not None:
+        engine.dispose()
+    engine = new_engine
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     Base.metadata.bind = engine
-
+    clear_cache()
     return True
 
 
+def perform_schema_upgrade():
+    try:
+        from db.models import upgrade_schema
+        upgrade_schema(engine)
+        clear_cache()
+        logger.info("схема базы данных обновлена")
+        return True
+    except Exception as exc:
+        logger.error(f"ошибка при обновлении схемы: {exc!r}")
+        return False
+
+
 def perform_recreate_tables():
     try:
         metadata = Base.metadata
         metadata.drop_all(bind=engine)
         metadata.create_all(bind=engine)
-        print("drop_all и create_all выполнены успешно.")
+        with engine.begin() as conn:
+            install_notify_triggers(conn)
+        clear_cache()
+        logger.info("drop_all и create_all выполнены успешно.")
         return True
     except Exception as exc:
-        print("ошибка при пересоздании таблиц:", exc)
+        logger.error(f"ошибка при пересоздании таблиц: {exc}")
         return False
 
 
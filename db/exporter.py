@@ -0,0 +1,107 @@
+import io
+import json
+import logging
+from pathlib import Path
+
+from sqlalchemy import select, asc, desc
+
+from db.models import Experiment, Run, Image
+from db.requests import with_session, EXPERIMENT_COLUMNS, RUN_COLUMNS, select_images
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 10000
+EXPORT_FORMATS = ('csv', 'jsonl')
+EMPTY_IMAGE_FILTERS = {'sort_id': None, 'file_type': None, 'attack_type': None}
+
+
+class _ProgressWriter(io.TextIOBase):
+    # наследник TextIOBase: psycopg2 передает такому файлу str, а не bytes
+    def __init__(self, file, progress):
+        self._file = file
+        self._progress = progress
+        self._in_quotes = False
+        # первая запись COPY ... HEADER - заголовок
+        self._records = -1
+        self._reported = 0
+
+    def write(self, data):
+        self._file.write(data)
+        self._records += self._count_records(data)
+        if self._progress is not None and self._records - self._reported >= EXPORT_BATCH_SIZE:
+            self._reported = self._records
+            self._progress(self._records)
+        return len(data)
+
+    def _count_records(self, data):
+        # запись csv кончается переводом строки вне кавычек; экранированная "" дважды меняет состояние
+        if '"' not in data:
+            return 0 if self._in_quotes else data.count('\n')
+        records = 0
+        for index, part in enumerate(data.split('"')):
+            if index:
+                self._in_quotes = not self._in_quotes
+            if not self._in_quotes:
+                records += part.count('\n')
+        return records
+
+
+def _format_from_path(path, fmt):
+    fmt = fmt or Path(path).suffix.lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"неподдерживаемый формат экспорта: {fmt}")
+    return fmt
+
+
+def _copy_csv(session, query, file, progress):
+    sql = query.compile(dialect=session.bind.dialect, compile_kwargs={'literal_binds': True})
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", _ProgressWriter(file, progress))
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def _stream_jsonl(session, query, file, progress):
+    result = session.execute(query, execution_options={'yield_per': EXPORT_BATCH_SIZE})
+    written = 0
+    for partition in result.partitions():
+        for row in partition:
+            file.write(json.dumps(dict(row._mapping), ensure_ascii=False, default=str))
+            file.write('\n')
+        written += len(partition)
+        if progress is not None:
+            progress(written)
+    return written
+
+
+@with_session()
+def _export(query, path, fmt, progress=None, *, session):
+    fmt = _format_from_path(path, fmt)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        if fmt == 'csv':
+            written = _copy_csv(session, query, file, progress)
+        else:
+            written = _stream_jsonl(session, query, file, progress)
+    if progress is not None:
+        progress(written)
+    logger.info(f"экспорт в {Path(path).name}: {written} строк")
+    return written
+
+
+def export_experiments(path, fmt=None, progress=None):
+    query = select(*EXPERIMENT_COLUMNS).order_by(asc(Experiment.experiment_id))
+    return _export(query, path, fmt, progress)
+
+
+def export_runs(path, fmt=None, progress=None):
+    query = select(*RUN_COLUMNS).order_by(asc(Run.run_id))
+    return _export(query, path, fmt, progress)
+
+
+def export_images(path, fmt=None, filters=None, progress=None):
+    filters = {**EMPTY_IMAGE_FILTERS, **(filters or {})}
+    query = select_images(filters)
+    query = query.order_by(desc(Image.image_id) if filters['sort_id'] == 'desc' else asc(Image.image_id))
+    return _export(query, path, fmt, progress)
@@ -0,0 +1,171 @@
+import csv
+import logging
+import random
+from datetime import datetime, timedelta
+
+from db.cache import invalidates
+from db.notifications import BULK_CHANGES_ON_SQL
+from db.requests import with_session
+
+logger = logging.getLogger(__name__)
+
+GENERATOR_SEED = 42
+GENERATOR_START = datetime(2022, 1, 1)
+GENERATOR_DAYS = 3 * 365
+COPY_READ_SIZE = 1 << 20
+PROGRESS_EVERY = 100000
+
+ATTACK_TYPE_WEIGHTS = {'no_attack': 50, 'noise': 20, 'blur': 15, 'adversarial': 10, 'other': 5}
+FILE_EXT_WEIGHTS = {'.jpg': 55, '.png': 30, '.jpeg': 8, '.bmp': 4, '.tiff': 3}
+IMAGE_SIZES = ((640, 480), (1280, 720), (1920, 1080), (224, 224), (512, 512))
+DESCRIPTIONS = (
+    "Классификация изображений без атак",
+    "Устойчивость к adversarial атакам",
+    "Устойчивость к шуму и размытию",
+    "Дообучение на расширенной выборке",
+    None,
+)
+
+COPY_SQL = {
+    'experiments': "COPY experiments (experiment_id, name, description, created_date) FROM STDIN WITH (FORMAT csv)",
+    'runs': "COPY runs (run_id, experiment_id, run_date, accuracy, flagged) FROM STDIN WITH (FORMAT csv)",
+    'images': "COPY images (image_id, run_id, file_path, original_name, attack_type, added_date, coordinates) "
+              "FROM STDIN WITH (FORMAT csv)",
+}
+
+SEQUENCES = (('experiments', 'experiment_id'), ('runs', 'run_id'), ('images', 'image_id'))
+
+
+class _CopySource:
+    # файловый объект для copy_expert, который берет строки csv из генератора, не собирая их в памяти
+    def __init__(self, rows, progress=None, offset=0):
+        self._rows = iter(rows)
+        self._buffer = _LineBuffer()
+        self._writer = csv.writer(self._buffer)
+        self._progress = progress
+        self._offset = offset
+        self.count = 0
+
+    def read(self, size=-1):
+        size = COPY_READ_SIZE if size is None or size < 0 else size
+        while self._buffer.size < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self.count += 1
+            if self._progress is not None and self.count % PROGRESS_EVERY == 0:
+                self._progress(self._offset + self.count)
+        return self._buffer.take(size)
+
+
+class _LineBuffer:
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(data)
+        self.size += len(data)
+
+    def take(self, size):
+        data = "".join(self._parts)
+        chunk, rest = data[:size], data[size:]
+        self._parts = [rest] if rest else []
+        self.size = len(rest)
+        return chunk
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _random_datetime(rng, start, days):
+    return (start + timedelta(seconds=rng.randrange(days * 86400))).replace(microsecond=0)
+
+
+def _skewed_id(rng, first_id, count):
+    # часть экспериментов/прогонов заметно "тяжелее" остальных
+    return first_id + int(count * rng.random() ** 2)
+
+
+def generate_experiments(rng, first_id, count, start):
+    for experiment_id in range(first_id, first_id + count):
+        created = start + timedelta(days=rng.randrange(GENERATOR_DAYS))
+        yield experiment_id, f"Synthetic experiment {experiment_id:06d}", rng.choice(DESCRIPTIONS), created
+
+
+def generate_runs(rng, first_id, count, first_experiment_id, experiments, start):
+    for run_id in range(first_id, first_id + count):
+        accuracy = None if rng.random() < 0.03 else round(rng.betavariate(8, 2), 4)
+        if rng.random() < 0.1:
+            flagged = None
+        else:
+            flagged = (accuracy is not None and accuracy < 0.6) or rng.random() < 0.05
+        yield (run_id, _skewed_id(rng, first_experiment_id, experiments),
+               _random_datetime(rng, start, GENERATOR_DAYS), accuracy, flagged)
+
+
+def generate_images(rng, first_id, count, first_run_id, runs, start):
+    for image_id in range(first_id, first_id + count):
+        run_id = _skewed_id(rng, first_run_id, runs)
+        ext = _weighted(rng, FILE_EXT_WEIGHTS)
+        if rng.random() < 0.1:
+            ext = ext.upper()
+        original_name = None if rng.random() < 0.3 else f"IMG_{rng.randrange(100000):05d}{ext}"
+        coordinates = None
+        if rng.random() < 0.7:
+            width, height = rng.choice(IMAGE_SIZES)
+            x1, y1 = rng.randrange(width // 2), rng.randrange(height // 2)
+            x2, y2 = rng.randrange(x1 + 10, width), rng.randrange(y1 + 10, height)
+            coordinates = f"{{{x1},{y1},{x2},{y2}}}"
+        yield (image_id, run_id, f"/data/synthetic/run_{run_id}/img_{image_id:09d}{ext}", original_name,
+               _weighted(rng, ATTACK_TYPE_WEIGHTS), _random_datetime(rng, start, GENERATOR_DAYS), coordinates)
+
+
+def _max_id(cursor, table, column):
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+@invalidates('experiments', 'runs', 'images')
+@with_session(commit=True)
+def generate_dataset(experiments=1000, runs=100000, images=1000000, seed=GENERATOR_SEED, truncate=False,
+                     progress=None, *, session):
+    if (runs and not experiments) or (images and not runs):
+        raise ValueError("для прогонов нужны эксперименты, для изображений - прогоны")
+    rng = random.Random(seed)
+    start = GENERATOR_START
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(BULK_CHANGES_ON_SQL)
+        if truncate:
+            cursor.execute("TRUNCATE images, runs, experiments RESTART IDENTITY CASCADE")
+        # явные id идут после уже существующих, поэтому данные можно догружать в непустую базу
+        first_experiment_id = _max_id(cursor, 'experiments', 'experiment_id') + 1
+        first_run_id = _max_id(cursor, 'runs', 'run_id') + 1
+        first_image_id = _max_id(cursor, 'images', 'image_id') + 1
+
+        tables = (
+            ('experiments', generate_experiments(rng, first_experiment_id, experiments, start.date())),
+            ('runs', generate_runs(rng, first_run_id, runs, first_experiment_id, experiments, start)),
+            ('images', generate_images(rng, first_image_id, images, first_run_id, runs, start)),
+        )
+        counts = {}
+        for table, rows in tables:
+            source = _CopySource(rows, progress, sum(counts.values()))
+            cursor.copy_expert(COPY_SQL[table], source)
+            counts[table] = source.count
+        if progress is not None:
+            progress(sum(counts.values()))
+
+        for table, column in SEQUENCES:
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                           f"COALESCE(MAX({column}), 1), MAX({column}) IS NOT NULL) FROM {table}")
+    finally:
+        cursor.close()
+
+    logger.info(f"сгенерировано: {counts['experiments']} экспериментов, {counts['runs']} прогонов, "
+                f"{counts['images']} изображений (seed={seed})")
+    return counts
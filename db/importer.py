@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+
+from db.cache import invalidates
+from db.notifications import BULK_CHANGES_ON_SQL
+from db.requests import with_session
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 50000
+MANIFEST_FIELDS = ("run_id", "file_path", "original_name", "attack_type", "coordinates")
+
+# строки манифеста попадают в stage как есть (текстом), проверяются и приводятся к типам одним запросом
+CREATE_STAGE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS images_stage (
+        line_no bigint NOT NULL,
+        run_id text,
+        file_path text,
+        original_name text,
+        attack_type text,
+        coordinates text
+    ) ON COMMIT DROP
+"""
+
+COPY_STAGE_SQL = """
+    COPY images_stage (line_no, run_id, file_path, original_name, attack_type, coordinates)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# те же правила, что у ImageCreate: пробелы по краям обрезаются, пустое имя - NULL;
+# координаты - целые через запятую, точку с запятой или пробел, в любых скобках
+_WHITESPACE = "E' \\t\\r\\n'"
+_PATH = f"btrim(s.file_path, {_WHITESPACE})"
+_NAME = f"nullif(btrim(s.original_name, {_WHITESPACE}), '')"
+_COORDINATES = f"btrim(regexp_replace(btrim(s.coordinates, E'[]{{}}() \\t\\r\\n'), '[;, ]+', ',', 'g'), ',')"
+
+REJECT_INVALID_SQL = f"""
+    WITH checked AS (
+        SELECT s.line_no, {_PATH} AS path,
+               CASE
+                   WHEN s.run_id IS NULL OR btrim(s.run_id) !~ '^[+-]?[0-9]{{1,9}}$'
+                       THEN 'run_id должен быть целым числом'
+                   WHEN coalesce({_PATH}, '') = '' THEN 'file_path не может быть пустой строкой'
+                   WHEN length({_PATH}) > 500 THEN 'file_path длиннее 500 символов'
+                   WHEN length({_NAME}) > 255 THEN 'original_name длиннее 255 символов'
+                   WHEN s.attack_type IS NULL
+                        OR s.attack_type <> ALL (enum_range(NULL::attack_type_enum)::text[])
+                       THEN 'недопустимый attack_type'
+                   WHEN s.coordinates IS NOT NULL AND {_COORDINATES} !~ '^([+-]?[0-9]{{1,9}}(,[+-]?[0-9]{{1,9}})*)?$'
+                       THEN 'coordinates должны быть списком целых чисел'
+                   WHEN NOT EXISTS (SELECT 1 FROM runs r WHERE r.run_id = btrim(s.run_id)::integer)
+                       THEN 'run не найден'
+                   WHEN EXISTS (SELECT 1 FROM images i WHERE i.file_path = {_PATH})
+                       THEN 'file_path уже существует'
+               END AS reason
+        FROM images_stage s
+    ), ranked AS (
+        SELECT line_no, coalesce(reason, CASE WHEN row_number() OVER (PARTITION BY reason IS NULL, path
+                                                                       ORDER BY line_no) > 1
+                                              THEN 'file_path повторяется в манифесте' END) AS reason
+        FROM checked
+    )
+    DELETE FROM images_stage s
+    USING ranked r
+    WHERE r.line_no = s.line_no AND r.reason IS NOT NULL
+    RETURNING s.line_no, r.reason
+"""
+
+MOVE_STAGE_SQL = f"""
+    INSERT INTO images (run_id, file_path, original_name, attack_type, coordinates)
+    SELECT btrim(s.run_id)::integer, {_PATH}, {_NAME}, s.attack_type::attack_type_enum,
+           string_to_array(nullif({_COORDINATES}, ''), ',')::integer[]
+    FROM images_stage s
+    ORDER BY s.line_no
+"""
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        positions = [header.index(key) if key in header else None for key in MANIFEST_FIELDS]
+        width = len(header)
+        pick = itemgetter(*positions) if None not in positions else None
+        for row in reader:
+            if pick is not None and len(row) == width:
+                yield reader.line_num, pick(row)
+            else:
+                yield reader.line_num, tuple(row[i] if i is not None and i < len(row) else None for i in positions)
+
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, e
+                continue
+            if not isinstance(row, dict):
+                yield line_no, ValueError(f"строка не является объектом: {row}")
+                continue
+            get = row.get
+            yield line_no, (_stage_value(get('run_id')), _stage_value(get('file_path')),
+                            _stage_value(get('original_name')), _stage_value(get('attack_type')),
+                            _stage_value(get('coordinates')))
+
+
+def _stage_value(value):
+    # в stage все текстом: числа как есть, списки координат через запятую
+    if value is None or type(value) is str:
+        return value
+    if isinstance(value, (list, tuple)):
+        return ",".join(map(str, value))
+    return str(value)
+
+
+def _stage_chunk(chunk):
+    # в python только разбор файла; сами проверки - в REJECT_INVALID_SQL
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    accepted = 0
+    errors = []
+    for line_no, row in chunk:
+        if isinstance(row, Exception):
+            errors.append((line_no, str(row)))
+            continue
+        writer.writerow((line_no, *row))
+        accepted += 1
+    buffer.seek(0)
+    return buffer, accepted, errors
+
+
+def _staged_chunks(rows, chunk_size):
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk, *_stage_chunk(chunk)
+
+
+class RejectWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.count = 0
+        self._file = None
+        self._raw_by_line = {}
+
+    def write(self, line_no, reason, raw):
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8')
+        self._file.write(json.dumps({'line': line_no, 'error': reason, 'row': raw}, ensure_ascii=False, default=str))
+        self._file.write('\n')
+        self.count += 1
+
+    def remember(self, chunk):
+        self._raw_by_line = dict(chunk)
+
+    def write_lines(self, rows):
+        for line_no, reason in sorted(rows):
+            raw = self._raw_by_line.get(line_no)
+            self.write(line_no, reason, dict(zip(MANIFEST_FIELDS, raw)) if isinstance(raw, tuple) else None)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+@invalidates('images')
+@with_session(commit=True)
+def import_images_manifest(path, rejects_path=None, chunk_size=IMPORT_CHUNK_SIZE, progress=None, *, session):
+    path = Path(path)
+    if path.suffix.lower() in ('.jsonl', '.ndjson'):
+        rows = _read_jsonl(path)
+    elif path.suffix.lower() == '.csv':
+        rows = _read_csv(path)
+    else:
+        raise ValueError(f"неподдерживаемый формат манифеста: {path.suffix}")
+
+    rejected = RejectWriter(rejects_path or path.with_name(path.name + '.rejected.jsonl'))
+    cursor = session.connection().connection.cursor()
+    cursor.execute(BULK_CHANGES_ON_SQL)
+    cursor.execute(CREATE_STAGE_SQL)
+    inserted = 0
+    processed = 0
+    staged = _staged_chunks(rows, chunk_size)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # следующая пачка разбирается, пока база проверяет и переносит текущую
+            pending = executor.submit(next, staged, None)
+            while True:
+                item = pending.result()
+                if item is None:
+                    break
+                pending = executor.submit(next, staged, None)
+                chunk, buffer, accepted, errors = item
+                rejected.remember(chunk)
+                rejected.write_lines(errors)
+                if accepted:
+                    cursor.copy_expert(COPY_STAGE_SQL, buffer)
+                    cursor.execute(REJECT_INVALID_SQL)
+                    rejected.write_lines(cursor.fetchall())
+                    cursor.execute(MOVE_STAGE_SQL)
+                    inserted += cursor.rowcount
+                    cursor.execute("TRUNCATE images_stage")
+                processed += len(chunk)
+                if progress is not None:
+                    progress(processed)
+    finally:
+        rejected.close()
+        cursor.close()
+
+    # подробности по отклоненным строкам только в файле, в лог - одна строка
+    if rejected.count:
+        logger.warning(f"импорт {path.name}: добавлено {inserted}, отклонено {rejected.count} (см. {rejected.path})")
+    else:
+        logger.info(f"импорт {path.name}: добавлено {inserted}")
+    return {'inserted': inserted, 'rejected': rejected.count, 'rejects_path': str(rejected.path) if rejected.count else None}
@@ -0,0 +1,121 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger('db.queries')
+
+QUERY_SAMPLE_SIZE = 1000
+SLOW_QUERY_LOG_CHARS = 300
+
+_operation = ContextVar('db_operation', default=None)
+_lock = threading.Lock()
+_stats = {}
+_settings = {'slow_query_ms': 0}
+
+# одинаковые запросы с разной длиной IN (...) / VALUES (...) считаем одним
+_PARAM_LIST = re.compile(r"\((?:%\(\w+\)s|\?)(?:, (?:%\(\w+\)s|\?))*\)(?:, \((?:%\(\w+\)s|\?)(?:, (?:%\(\w+\)s|\?))*\))*")
+_SPACES = re.compile(r"\s+")
+
+
+class QueryStats:
+    def __init__(self, operation, statement):
+        self.operation = operation
+        self.statement = statement
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=QUERY_SAMPLE_SIZE)
+
+    def add(self, elapsed_ms, rows):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if rows > 0:
+            self.rows += rows
+        self.samples.append(elapsed_ms)
+
+    def percentile(self, value):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * value / 100))]
+
+    def as_dict(self):
+        return {
+            'operation': self.operation,
+            'statement': self.statement,
+            'calls': self.calls,
+            'rows': self.rows,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.calls if self.calls else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max_ms,
+        }
+
+
+def normalize_statement(statement):
+    return _PARAM_LIST.sub("(...)", _SPACES.sub(" ", statement).strip())
+
+
+@contextmanager
+def operation(name):
+    token = _operation.set(name)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def install_query_timing(engine, slow_query_ms=0):
+    _settings['slow_query_ms'] = slow_query_ms
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        record_query(statement, (time.perf_counter() - started) * 1000, cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+
+def record_query(statement, elapsed_ms, rows):
+    name = _operation.get() or '-'
+    key = (name, normalize_statement(statement))
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = QueryStats(*key)
+        stats.add(elapsed_ms, rows)
+
+    threshold = _settings['slow_query_ms']
+    if threshold and elapsed_ms >= threshold:
+        logger.warning(f"медленный запрос {elapsed_ms:.0f} мс в {name} (строк: {rows}): "
+                       f"{key[1][:SLOW_QUERY_LOG_CHARS]}")
+
+
+def get_query_stats(limit=20, order_by='total_ms'):
+    with _lock:
+        rows = [stats.as_dict() for stats in _stats.values()]
+    rows.sort(key=lambda row: row[order_by], reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def reset_query_stats():
+    with _lock:
+        _stats.clear()
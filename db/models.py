@@ -1,10 +1,17 @@
+import logging
+import re
 from datetime import date, datetime
 from typing import Optional, List
 
-from sqlalchemy import Integer, String, Date, Text, func, TIMESTAMP, ForeignKey, JSON, Float, Enum, ARRAY, Boolean, text
+from sqlalchemy import Integer, String, Date, Text, func, TIMESTAMP, ForeignKey, JSON, Float, Enum, ARRAY, Boolean, text, \
+    Computed, Index, inspect
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.schema import CreateColumn, CreateIndex
 import enum
 from db.database import Base
+from db.notifications import install_notify_triggers, notify_triggers_installed
+
+logger = logging.getLogger(__name__)
 
 class AttackTypeEnum(str, enum.Enum):
     no_attack = "no_attack"
@@ -21,29 +28,36 @@ class Experiment(Base):
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_date: Mapped[date] = mapped_column(Date, server_default=func.current_date())
 
-    runs: Mapped[list["Run"]] = relationship("Run", back_populates="experiment", cascade="all, delete-orphan")
+    runs: Mapped[list["Run"]] = relationship("Run", back_populates="experiment", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Run(Base):
     __tablename__ = "runs"
 
     run_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    experiment_id: Mapped[int] = mapped_column(ForeignKey("experiments.experiment_id", ondelete="CASCADE"))
+    experiment_id: Mapped[int] = mapped_column(ForeignKey("experiments.experiment_id", ondelete="CASCADE"), index=True)
     run_date: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now())
 
     accuracy: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     flagged: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
 
     experiment: Mapped["Experiment"] = relationship("Experiment", back_populates="runs")
-    images: Mapped[list["Image"]] = relationship("Image", back_populates="run", cascade="all, delete-orphan")
+    images: Mapped[list["Image"]] = relationship("Image", back_populates="run", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Image(Base):
     __tablename__ = "images"
+    __table_args__ = (
+        Index("ix_images_attack_type_image_id", "attack_type", "image_id"),
+        Index("ix_images_file_ext_image_id", "file_ext", "image_id"),
+        Index("ix_images_attack_type_file_ext_image_id", "attack_type", "file_ext", "image_id"),
+    )
 
     image_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    run_id: Mapped[int] = mapped_column(ForeignKey("runs.run_id", ondelete="CASCADE"))
+    run_id: Mapped[int] = mapped_column(ForeignKey("runs.run_id", ondelete="CASCADE"), index=True)
     file_path: Mapped[str] = mapped_column(String(500), nullable=False, unique=True)
+    file_ext: Mapped[Optional[str]] = mapped_column(Text, Computed("lower(substring(file_path from '\\.[^./]*$'))",
+                                                                   persisted=True))
     original_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
     attack_type: Mapped[AttackTypeEnum] = mapped_column(Enum(AttackTypeEnum, name="attack_type_enum"), nullable=False)
@@ -52,3 +66,76 @@ class Image(Base):
     coordinates: Mapped[Optional[List[int]]] = mapped_column(ARRAY(Integer, dimensions=1), nullable=True)
 
     run: Mapped["Run"] = relationship("Run", back_populates="images")
+
+
+# вычисляемые колонки, которые можно добавить в существующую таблицу без переноса данных
+UPGRADE_COLUMNS = (Image.__table__.c.file_ext,)
+
+
+def _index_validity(connection, table):
+    # имя индекса -> indisvalid; прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс
+    rows = connection.execute(text("""
+        SELECT c.relname, i.indisvalid
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(:table)
+    """), {'table': table.name})
+    return dict(rows.all())
+
+
+def _existing_tables(inspector):
+    return [table for table in Base.metadata.sorted_tables if inspector.has_table(table.name)]
+
+
+def schema_upgrades_pending(engine):
+    # чего не хватает базе, созданной прежней версией (file_ext, индексы фильтров, триггеры уведомлений);
+    # пустой список - схема актуальна
+    inspector = inspect(engine)
+    tables = _existing_tables(inspector)
+    pending = []
+    with engine.connect() as connection:
+        for table in tables:
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            pending.extend(f"колонка {table.name}.{column.name}" for column in UPGRADE_COLUMNS
+                           if column.table is table and column.name not in columns)
+            indexes = _index_validity(connection, table)
+            pending.extend(f"индекс {index.name}" for index in table.indexes if not indexes.get(index.name))
+        if len(tables) == len(Base.metadata.sorted_tables) and not notify_triggers_installed(connection):
+            pending.append("триггеры уведомлений")
+    return pending
+
+
+def upgrade_schema(engine):
+    # долгий шаг для больших таблиц, поэтому только явно (cli.py upgrade), а не при каждом подключении
+    inspector = inspect(engine)
+    tables = _existing_tables(inspector)
+    with engine.begin() as connection:
+        # ADD COLUMN ... STORED переписывает таблицу; DB_STATEMENT_TIMEOUT_MS оборвал бы его на полпути
+        connection.exec_driver_sql("SET LOCAL statement_timeout = 0")
+        for table in tables:
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in UPGRADE_COLUMNS:
+                if column.table is table and column.name not in columns:
+                    logger.info(f"добавление колонки {table.name}.{column.name}")
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {ddl}")
+        if len(tables) == len(Base.metadata.sorted_tables) and not notify_triggers_installed(connection):
+            logger.info("установка триггеров уведомлений")
+            install_notify_triggers(connection)
+
+    # CONCURRENTLY не блокирует запись в таблицу, но выполняется только вне транзакции
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("SET statement_timeout = 0")
+        try:
+            for table in tables:
+                indexes = _index_validity(connection, table)
+                for index in table.indexes:
+                    valid = indexes.get(index.name)
+                    if valid:
+                        continue
+                    if valid is False:
+                        connection.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}")
+                    logger.info(f"создание индекса {index.name}")
+                    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                    connection.exec_driver_sql(re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl))
+        finally:
+            connection.exec_driver_sql("RESET statement_timeout")
@@ -0,0 +1,218 @@
+import json
+import logging
+import select
+import threading
+
+from sqlalchemy import text
+
+import db.database
+from db.cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "db_kr_changes"
+# NOTIFY ограничен ~8000 байт; при большем числе id отправляем "изменено все"
+NOTIFY_MAX_IDS = 500
+LISTEN_POLL_SECONDS = 1.0
+RECONNECT_SECONDS = 5.0
+
+NOTIFY_TABLES = (("experiments", "experiment_id"), ("runs", "run_id"), ("images", "image_id"))
+
+# массовые загрузки и обновления включают эту настройку на время транзакции: строковые триггеры не срабатывают
+# (условие WHEN), id не собираются, а после каждого запроса уходит одно уведомление "изменена вся таблица"
+BULK_CHANGES_SETTING = "db_kr.bulk_changes"
+BULK_CHANGES_ON_SQL = f"SELECT set_config('{BULK_CHANGES_SETTING}', 'on', true)"
+BULK_CHANGES_OFF_SQL = f"SELECT set_config('{BULK_CHANGES_SETTING}', 'off', true)"
+_NOT_BULK = f"current_setting('{BULK_CHANGES_SETTING}', true) IS DISTINCT FROM 'on'"
+
+# триггеры с transition tables (REFERENCING ... TABLE) копируют каждую измененную строку, даже если функция
+# ее не читает, поэтому id собирает строковый триггер (первые NOTIFY_MAX_IDS, дальше - "all")
+# в настройку транзакции, а триггер на запрос отправляет уведомление и очищает ее
+COLLECT_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_collect_row() RETURNS trigger AS $$
+DECLARE
+    setting text := 'db_kr.changed_' || TG_ARGV[0];
+    collected text := coalesce(current_setting(setting, true), '');
+BEGIN
+    IF collected = 'all' THEN
+        RETURN NULL;
+    END IF;
+    IF cardinality(string_to_array(collected, ',')) >= {NOTIFY_MAX_IDS} THEN
+        PERFORM set_config(setting, 'all', true);
+        RETURN NULL;
+    END IF;
+    PERFORM set_config(setting, concat_ws(',', nullif(collected, ''),
+        CASE WHEN TG_OP = 'DELETE' THEN to_jsonb(OLD) ELSE to_jsonb(NEW) END ->> TG_ARGV[1]), true);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_rows_changed() RETURNS trigger AS $$
+DECLARE
+    setting text := 'db_kr.changed_' || TG_TABLE_NAME;
+    collected text := coalesce(current_setting(setting, true), '');
+    changed_ids bigint[];
+BEGIN
+    PERFORM set_config(setting, '', true);
+    IF TG_OP = 'TRUNCATE' OR collected = 'all' OR current_setting('{BULK_CHANGES_SETTING}', true) = 'on' THEN
+        changed_ids := NULL;
+    ELSIF collected = '' THEN
+        RETURN NULL;
+    ELSE
+        changed_ids := string_to_array(collected, ',')::bigint[];
+    END IF;
+
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+        'table', TG_TABLE_NAME, 'op', TG_OP, 'ids', changed_ids)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# в images показывается experiment_id прогона: перенос прогона в другой эксперимент меняет строки images
+RUN_IMAGES_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_run_images_changed() RETURNS trigger AS $$
+DECLARE
+    collected text := coalesce(current_setting('db_kr.changed_runs_images', true), '');
+    changed_ids bigint[];
+BEGIN
+    PERFORM set_config('db_kr.changed_runs_images', '', true);
+    IF collected = 'all' OR current_setting('{BULK_CHANGES_SETTING}', true) = 'on' THEN
+        changed_ids := NULL;
+    ELSIF collected = '' THEN
+        RETURN NULL;
+    ELSE
+        SELECT array_agg(image_id) INTO changed_ids FROM (
+            SELECT image_id FROM images
+            WHERE run_id = ANY (string_to_array(collected, ',')::integer[])
+            LIMIT {NOTIFY_MAX_IDS + 1}) s;
+        IF changed_ids IS NULL THEN
+            RETURN NULL;
+        END IF;
+        IF cardinality(changed_ids) > {NOTIFY_MAX_IDS} THEN
+            changed_ids := NULL;
+        END IF;
+    END IF;
+
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+        'table', 'images', 'op', TG_OP, 'ids', changed_ids)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGER_SQL = (
+    ("{table}_notify_rows", "AFTER INSERT OR UPDATE OR DELETE ON {table} FOR EACH ROW WHEN (" + _NOT_BULK + ") "
+                            "EXECUTE FUNCTION notify_collect_row('{table}', '{id_column}')"),
+    ("{table}_notify_statement", "AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} FOR EACH STATEMENT "
+                                 "EXECUTE FUNCTION notify_rows_changed()"),
+)
+
+RUN_IMAGES_TRIGGER_SQL = (
+    ("runs_notify_images_rows", "AFTER UPDATE OF experiment_id ON runs FOR EACH ROW "
+                                "WHEN (OLD.experiment_id IS DISTINCT FROM NEW.experiment_id AND " + _NOT_BULK + ") "
+                                "EXECUTE FUNCTION notify_collect_row('runs_images', 'run_id')"),
+    ("runs_notify_images", "AFTER UPDATE OF experiment_id ON runs FOR EACH STATEMENT "
+                           "EXECUTE FUNCTION notify_run_images_changed()"),
+)
+
+# триггеры прежней версии: на каждую операцию свой, с transition tables
+LEGACY_TRIGGERS = tuple((f"{table}_notify_{op}", table) for table, _ in NOTIFY_TABLES
+                        for op in ("insert", "update", "delete", "truncate"))
+
+
+def _notify_triggers():
+    for table, id_column in NOTIFY_TABLES:
+        for name, when in TRIGGER_SQL:
+            yield name.format(table=table), table, when.format(table=table, id_column=id_column)
+    for name, when in RUN_IMAGES_TRIGGER_SQL:
+        yield name, "runs", when
+
+
+def install_notify_triggers(connection):
+    for name, table in LEGACY_TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name} ON {table}"))
+    for function_sql in (COLLECT_FUNCTION_SQL, NOTIFY_FUNCTION_SQL, RUN_IMAGES_FUNCTION_SQL):
+        connection.execute(text(function_sql))
+    for name, table, when in _notify_triggers():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name} ON {table}"))
+        connection.execute(text(f"CREATE TRIGGER {name} {when}"))
+
+
+def notify_triggers_installed(connection):
+    query = text("SELECT tgname FROM pg_trigger WHERE tgname LIKE '%\\_notify\\_%' AND NOT tgisinternal")
+    installed = set(connection.execute(query).scalars())
+    return installed == {name for name, _, _ in _notify_triggers()}
+
+
+class ChangeListener(threading.Thread):
+    # собственное соединение драйвера, не из пула: LISTEN держит его все время работы, а соединение
+    # из пула могло бы прийти с незавершенной транзакцией или настройками, сделанными при выдаче
+    def __init__(self, engine, callback):
+        super().__init__(name="db-change-listener", daemon=True)
+        self._engine = engine
+        self._callback = callback
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception as exc:
+                logger.warning(f"прослушивание изменений прервано: {exc}")
+                self._stopped.wait(RECONNECT_SECONDS)
+
+    def _listen(self):
+        dialect = self._engine.dialect
+        cargs, cparams = dialect.create_connect_args(self._engine.url)
+        connection = dialect.connect(*cargs, **cparams)
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while not self._stopped.is_set():
+                if select.select([connection], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    self._dispatch(connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+    def _dispatch(self, payload):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.warning(f"некорректное уведомление: {payload[:200]}")
+            return
+        invalidate(change['table'])
+        ids = None if change['ids'] is None else set(change['ids'])
+        self._callback(change['table'], change['op'], ids)
+
+
+_listener = None
+
+
+def start_listener(callback):
+    global _listener
+    stop_listener()
+    engine = db.database.engine
+    if engine.engine_options.DB_PGBOUNCER:
+        # в режиме transaction pooling pgbouncer отдает серверное соединение другим клиентам, и LISTEN теряется
+        logger.info("отслеживание изменений в базе отключено: подключение через PgBouncer")
+        return None
+    _listener = ChangeListener(engine, callback)
+    _listener.start()
+    return _listener
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
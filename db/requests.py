@@ -1,36 +1,66 @@
+from contextlib import contextmanager
 from datetime import datetime, UTC, date
 from functools import wraps
 from typing import Optional, Any, List
 
 from pydantic import ValidationError
-from sqlalchemy import select, desc, text, asc
+from sqlalchemy import select, desc, text, asc, insert, func, delete, update, values, column, cast, bindparam
 import db.database
+from db.cache import cached, invalidates
+from db.cancel import current_cancel_token
+from db.instrumentation import operation
 from db.models import Experiment, Run, Image, AttackTypeEnum
+from db.notifications import NOTIFY_MAX_IDS, BULK_CHANGES_ON_SQL, BULK_CHANGES_OFF_SQL
 from db.schemas import ExperimentCreate, RunCreate, ImageCreate, ImageEdit, RunEdit
 from sqlalchemy.exc import IntegrityError
 
 from test_data import experiments_data, runs_data, images_data
 
+BULK_CHUNK_SIZE = 5000
+PAGE_SIZE = 500
+
+EXPERIMENT_COLUMNS = (Experiment.experiment_id, Experiment.name, Experiment.description, Experiment.created_date)
+RUN_COLUMNS = (Run.run_id, Run.experiment_id, Run.run_date, Run.accuracy, Run.flagged)
+IMAGE_COLUMNS = (Image.image_id, Image.run_id, Run.experiment_id, Image.file_path, Image.original_name,
+                 Image.added_date, Image.coordinates, Image.attack_type)
 
 def with_session(commit = False):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            with db.database.SessionLocal() as session:
-                kwargs['session'] = session
-                result = func(*args, **kwargs)
-                if commit:
-                    session.commit()
-                return result
+            session = db.database.current_session()
+            with operation(func.__name__):
+                if session is not None:
+                    # внутри unit_of_work коммитит внешний блок, здесь только отправляем изменения в базу
+                    kwargs['session'] = session
+                    result = func(*args, **kwargs)
+                    if commit:
+                        session.flush()
+                    return result
+                with db.database.SessionLocal() as session:
+                    kwargs['session'] = session
+                    token = current_cancel_token()
+                    # фоновый запрос, который уже не нужен GUI, отменяется на сервере через этот токен
+                    previous = token.bind(session.connection().connection.driver_connection) if token else None
+                    try:
+                        result = func(*args, **kwargs)
+                        if commit:
+                            session.commit()
+                    finally:
+                        if token is not None:
+                            token.unbind(previous)
+                    return result
         return wrapper
     return decorator
 
+@invalidates('experiments')
 @with_session(commit=True)
 def create_experiment(name, description = None, *, session):
     ExperimentCreate(name=name, description=description, created_date=datetime.now().date())
     exp = Experiment(name=name, description=description, created_date=datetime.now().date())
     session.add(exp)
 
+@invalidates('runs')
 @with_session(commit=True)
 def create_run(experiment_id, accuracy = None, flagged = None, *, session):
     RunCreate(experiment_id=experiment_id, run_date=datetime.now(UTC), accuracy=accuracy, flagged=flagged)
@@ -40,6 +70,7 @@ def create_run(experiment_id, accuracy = None, flagged = None, *, session):
     run = Run(experiment_id=experiment_id, run_date=datetime.now(UTC), accuracy=accuracy, flagged=flagged)
     session.add(run)
 
+@invalidates('images')
 @with_session(commit=True)
 def create_image(run_id, file_path, attack_type, original_name = None, added_date = None, coordinates = None, *, session):
     ImageCreate(run_id=run_id, file_path=file_path, original_name=original_name, attack_type=attack_type,
@@ -49,26 +80,192 @@ def create_image(run_id, file_path, attack_type, original_name = None, added_dat
     img = Image(run_id=run_id, file_path=file_path, original_name=original_name, attack_type=attack_type, added_date=added_date, coordinates=coordinates)
     session.add(img)
 
+def _validate_batch(schema, rows):
+    validated = []
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            validated.append(schema(**row))
+        except ValidationError as e:
+            errors.append(f"строка {index}: {e}")
+    if errors:
+        raise ValueError("некорректные данные:\n" + "\n".join(errors))
+    return validated
+
+def _check_ids_exist(session, column, ids, entity_name):
+    ids = set(ids)
+    if not ids:
+        return
+    found = set(session.execute(select(column).where(column.in_(ids))).scalars())
+    missing = sorted(ids - found)
+    if missing:
+        raise ValueError(f"{entity_name} с id={', '.join(map(str, missing))} не найден")
+
+@contextmanager
+def _bulk_changes(session, count=None):
+    # больше NOTIFY_MAX_IDS id в уведомление не помещается (count=None - заранее неизвестно): триггеры
+    # уведомлений не собирают строки, после каждого запроса уходит одно "изменена вся таблица"
+    if count is not None and count <= NOTIFY_MAX_IDS:
+        yield
+        return
+    session.execute(text(BULK_CHANGES_ON_SQL))
+    yield
+    session.execute(text(BULK_CHANGES_OFF_SQL))
+
+def _insert_chunked(session, model, pk_column, values, stmt=None):
+    stmt = (insert(model) if stmt is None else stmt).returning(pk_column, sort_by_parameter_order=True)
+    new_ids = []
+    with _bulk_changes(session, len(values)):
+        for start in range(0, len(values), BULK_CHUNK_SIZE):
+            chunk = values[start:start + BULK_CHUNK_SIZE]
+            new_ids.extend(session.execute(stmt, chunk).scalars())
+    return new_ids
+
+def _delete_chunked(session, model, pk_column, ids):
+    # удаление одним запросом на пачку id, дочерние строки удаляет сам PostgreSQL (ON DELETE CASCADE)
+    ids = sorted(set(ids))
+    deleted = 0
+    with _bulk_changes(session, len(ids)):
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            stmt = delete(model).where(pk_column.in_(ids[start:start + BULK_CHUNK_SIZE]))
+            deleted += session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+    return deleted
+
+def _validate_values(schema, values):
+    # проверяем только переданные поля схемы, один раз на весь запрос
+    unknown = set(values) - set(schema.model_fields)
+    if unknown:
+        raise ValueError(f"неизвестные поля: {', '.join(sorted(unknown))}")
+    if not values:
+        raise ValueError("нет значений для обновления")
+    item = schema.model_construct()
+    try:
+        for field, value in values.items():
+            schema.__pydantic_validator__.validate_assignment(item, field, value)
+    except ValidationError as e:
+        raise ValueError(f"некорректные изменения: {e}") from e
+    return {field: getattr(item, field) for field in values}
+
+def _execute_update(session, stmt, count=None):
+    if stmt.whereclause is None:
+        raise ValueError("не указаны id или фильтры для обновления")
+    with _bulk_changes(session, count):
+        return session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+
+def _update_rows(session, model, pk_column, rows):
+    # UPDATE ... FROM (VALUES ...): свои значения для каждой строки одним запросом на пачку
+    fields = sorted(set(rows[0]) - {pk_column.key}) if rows else []
+    updated = 0
+    with _bulk_changes(session, len(rows)):
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            chunk = rows[start:start + BULK_CHUNK_SIZE]
+            source = values(column(pk_column.key, pk_column.type),
+                            *(column(field, model.__table__.c[field].type) for field in fields),
+                            name='v').data([tuple(row[key] for key in (pk_column.key, *fields)) for row in chunk])
+            stmt = (update(model).where(pk_column == source.c[pk_column.key])
+                    .values({field: cast(source.c[field], model.__table__.c[field].type) for field in fields}))
+            updated += session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+    return updated
+
+def _validate_rows(schema, pk_name, rows):
+    rows = list(rows)
+    if not rows:
+        return []
+    fields = set(rows[0]) - {pk_name}
+    validated = []
+    errors = []
+    for index, row in enumerate(rows):
+        if pk_name not in row or set(row) - {pk_name} != fields:
+            errors.append(f"строка {index}: ожидаются поля {pk_name}, {', '.join(sorted(fields))}")
+            continue
+        try:
+            item = _validate_values(schema, {key: row[key] for key in fields})
+        except ValueError as e:
+            errors.append(f"строка {index}: {e}")
+            continue
+        item[pk_name] = row[pk_name]
+        validated.append(item)
+    if errors:
+        raise ValueError("некорректные данные:\n" + "\n".join(errors))
+    return validated
+
+@invalidates('experiments')
+@with_session(commit=True)
+def create_experiments_bulk(rows, *, session):
+    today = datetime.now().date()
+    validated = _validate_batch(ExperimentCreate, rows)
+    values = [
+        {'name': item.name, 'description': item.description, 'created_date': item.created_date or today}
+        for item in validated
+    ]
+    return _insert_chunked(session, Experiment, Experiment.experiment_id, values)
+
+@invalidates('runs')
+@with_session(commit=True)
+def create_runs_bulk(rows, *, session):
+    now = datetime.now(UTC)
+    validated = _validate_batch(RunCreate, rows)
+    _check_ids_exist(session, Experiment.experiment_id, (item.experiment_id for item in validated), "Experiment")
+    values = [
+        {'experiment_id': item.experiment_id, 'run_date': item.run_date or now,
+         'accuracy': item.accuracy, 'flagged': item.flagged}
+        for item in validated
+    ]
+    return _insert_chunked(session, Run, Run.run_id, values)
+
+@invalidates('images')
+@with_session(commit=True)
+def create_images_bulk(rows, *, session):
+    validated = _validate_batch(ImageCreate, rows)
+    _check_ids_exist(session, Run.run_id, (item.run_id for item in validated), "Run")
+    values = [
+        {'run_id': item.run_id, 'file_path': item.file_path, 'original_name': item.original_name,
+         'attack_type': item.attack_type, 'added_date_value': item.added_date, 'coordinates': item.coordinates}
+        for item in validated
+    ]
+    # без added_date берется серверное значение по умолчанию, как у create_image
+    added_date = Image.__table__.c.added_date
+    stmt = insert(Image).values(added_date=func.coalesce(bindparam('added_date_value', type_=added_date.type),
+                                                         added_date.server_default.arg))
+    return _insert_chunked(session, Image, Image.image_id, values, stmt)
+
+@cached('experiments')
 @with_session()
 def get_experiment_max_id(*, session):
     result = session.execute(text("SELECT COALESCE(MAX(experiment_id), 0) FROM experiments"))
     return result.scalar()
 
+@cached('runs')
 @with_session()
 def get_run_max_id(*, session):
     result = session.execute(text("SELECT COALESCE(MAX(run_id), 0) FROM runs"))
     return result.scalar()
 
+@cached('experiments')
 @with_session()
 def get_all_experiments(*, session):
-    results = session.execute(select(Experiment)).scalars().all()
+    results = session.execute(select(*EXPERIMENT_COLUMNS)).all()
     return results
 
+@cached('experiments')
+@with_session()
+def get_experiments_page(page_size=PAGE_SIZE, after_id=None, *, session):
+    query = select(*EXPERIMENT_COLUMNS).order_by(asc(Experiment.experiment_id)).limit(page_size)
+    if after_id is not None:
+        query = query.where(Experiment.experiment_id > after_id)
+    return session.execute(query).all()
+
+@cached('experiments')
 @with_session()
 def get_experiment_by_id(experiment_id, *, session):
     experiment = session.query(Experiment).filter(Experiment.experiment_id == experiment_id).first()
     return experiment
 
+@with_session()
+def get_experiments_by_ids(ids, *, session):
+    return session.execute(select(*EXPERIMENT_COLUMNS).where(Experiment.experiment_id.in_(list(ids)))).all()
+
+@invalidates('experiments')
 @with_session(commit=True)
 def update_experiment(experiment_id, name, description, *, session):
     try:
@@ -79,23 +276,39 @@ def update_experiment(experiment_id, name, description, *, session):
     if experiment:
         experiment.name = update_data.name
         experiment.description = update_data.description
+        session.flush()
+    return session.execute(select(*EXPERIMENT_COLUMNS).where(Experiment.experiment_id == experiment_id)).one_or_none()
 
+@invalidates('experiments', 'runs', 'images')
 @with_session(commit=True)
 def delete_experiment(experiment_id, *, session):
-    experiment = session.query(Experiment).filter(Experiment.experiment_id == experiment_id).first()
-    if experiment:
-        session.delete(experiment)
+    return _delete_chunked(session, Experiment, Experiment.experiment_id, [experiment_id])
 
+@cached('runs')
 @with_session()
 def get_all_runs(*, session):
-    results = session.execute(select(Run)).scalars().all()
+    results = session.execute(select(*RUN_COLUMNS)).all()
     return results
 
+@cached('runs')
+@with_session()
+def get_runs_page(page_size=PAGE_SIZE, after_id=None, *, session):
+    query = select(*RUN_COLUMNS).order_by(asc(Run.run_id)).limit(page_size)
+    if after_id is not None:
+        query = query.where(Run.run_id > after_id)
+    return session.execute(query).all()
+
+@cached('runs')
 @with_session()
 def get_run_by_id(run_id, *, session):
     run = session.query(Run).filter(Run.run_id == run_id).first()
     return run
 
+@with_session()
+def get_runs_by_ids(ids, *, session):
+    return session.execute(select(*RUN_COLUMNS).where(Run.run_id.in_(list(ids)))).all()
+
+@invalidates('runs')
 @with_session(commit=True)
 def update_run(experiment_id, run_id, accuracy, flagged, *, session):
     try:
@@ -107,48 +320,99 @@ def update_run(experiment_id, run_id, accuracy, flagged, *, session):
         run.accuracy = accuracy
         run.flagged = flagged
         run.experiment_id = experiment_id
+        session.flush()
+    return session.execute(select(*RUN_COLUMNS).where(Run.run_id == run_id)).one_or_none()
 
+def _filter_runs(query, filters):
+    if filters.get('experiment_id') is not None:
+        query = query.where(Run.experiment_id == filters['experiment_id'])
+    if filters.get('flagged') is not None:
+        query = query.where(Run.flagged.is_(filters['flagged']))
+    return query
+
+@invalidates('runs')
+@with_session(commit=True)
+def update_runs_bulk(values, ids=None, filters=None, *, session):
+    values = _validate_values(RunEdit, values)
+    if 'experiment_id' in values:
+        _check_ids_exist(session, Experiment.experiment_id, [values['experiment_id']], "Experiment")
+    stmt = update(Run).values(**values)
+    if ids is not None:
+        ids = list(ids)
+        stmt = stmt.where(Run.run_id.in_(ids))
+    if filters:
+        stmt = _filter_runs(stmt, filters)
+    return _execute_update(session, stmt, len(ids) if ids is not None and not filters else None)
+
+@invalidates('runs')
+@with_session(commit=True)
+def update_runs_rows(rows, *, session):
+    rows = _validate_rows(RunEdit, 'run_id', rows)
+    if rows and 'experiment_id' in rows[0]:
+        _check_ids_exist(session, Experiment.experiment_id, (row['experiment_id'] for row in rows), "Experiment")
+    return _update_rows(session, Run, Run.run_id, rows)
+
+@invalidates('runs', 'images')
 @with_session(commit=True)
 def delete_run(run_id, *, session):
-    run = session.query(Run).filter(Run.run_id == run_id).first()
-    if run:
-        session.delete(run)
+    return _delete_chunked(session, Run, Run.run_id, [run_id])
 
+@invalidates('runs', 'images')
+@with_session(commit=True)
+def delete_runs(ids, *, session):
+    return _delete_chunked(session, Run, Run.run_id, ids)
+
+@cached('images')
 @with_session()
 def get_all_images(*, session):
     images = session.query(Image).all()
     return images
 
+def _filter_images(query, filters):
+    if filters.get('attack_type'):
+        query = query.filter(Image.attack_type == filters['attack_type'])
+    if filters.get('file_type'):
+        # file_ext хранится в нижнем регистре, поэтому ".JPG" тоже должен находить файлы
+        query = query.filter(Image.file_ext == filters['file_type'].lower())
+    return query
+
+def select_images(filters):
+    query = select(*IMAGE_COLUMNS).join(Run, Image.run_id == Run.run_id)
+    return _filter_images(query, filters)
+
+@cached('images', 'runs')
 @with_session()
 def get_all_images_filtered(filters, *, session):
-    query = session.query(Image)
-    if filters['attack_type']:
-        query = query.filter(Image.attack_type == filters['attack_type'])
-    if filters['file_type']:
-        query = query.filter(Image.file_path.endswith(filters['file_type']))
-    if filters['sort_id'] == 'asc':
-        query = query.order_by(asc(Image.image_id))
-    elif filters['sort_id'] == 'desc':
+    query = select_images(filters)
+    if filters['sort_id'] == 'desc':
         query = query.order_by(desc(Image.image_id))
-    if not filters['sort_id']:
+    else:
         query = query.order_by(asc(Image.image_id))
 
-    rows = query.join(Run, Image.run_id == Run.run_id).add_columns(Run.experiment_id).all()
+    return session.execute(query).all()
 
-    images = []
-    for row in rows:
-        image_obj = row[0]
-        experiment_id = row[1]
-        setattr(image_obj, 'experiment_id', experiment_id)
-        images.append(image_obj)
+@cached('images', 'runs')
+@with_session()
+def get_images_filtered_page(filters, page_size=PAGE_SIZE, after_id=None, *, session):
+    query = select_images(filters)
+    descending = filters['sort_id'] == 'desc'
+    if after_id is not None:
+        query = query.where(Image.image_id < after_id if descending else Image.image_id > after_id)
+    query = query.order_by(desc(Image.image_id) if descending else asc(Image.image_id)).limit(page_size)
 
-    return images
+    return session.execute(query).all()
 
+@cached('images')
 @with_session()
 def get_image_by_id(image_id, *, session):
     image = session.query(Image).filter(Image.image_id == image_id).first()
     return image
 
+@with_session()
+def get_images_by_ids(ids, filters, *, session):
+    return session.execute(select_images(filters).where(Image.image_id.in_(list(ids)))).all()
+
+@invalidates('images')
 @with_session(commit=True)
 def update_image(image_id, run_id, attack_type, *, session):
     try:
@@ -159,20 +423,71 @@ def update_image(image_id, run_id, attack_type, *, session):
     if image:
         image.attack_type = attack_type
         image.run_id = run_id
+        session.flush()
+    return session.execute(select_images({}).where(Image.image_id == image_id)).one_or_none()
+
+@invalidates('images')
+@with_session(commit=True)
+def update_images_bulk(values, ids=None, filters=None, *, session):
+    values = _validate_values(ImageEdit, values)
+    if 'run_id' in values:
+        _check_ids_exist(session, Run.run_id, [values['run_id']], "Run")
+    stmt = update(Image).values(**values)
+    if ids is not None:
+        ids = list(ids)
+        stmt = stmt.where(Image.image_id.in_(ids))
+    if filters:
+        stmt = _filter_images(stmt, filters)
+    return _execute_update(session, stmt, len(ids) if ids is not None and not filters else None)
+
+@invalidates('images')
+@with_session(commit=True)
+def update_images_rows(rows, *, session):
+    rows = _validate_rows(ImageEdit, 'image_id', rows)
+    if rows and 'run_id' in rows[0]:
+        _check_ids_exist(session, Run.run_id, (row['run_id'] for row in rows), "Run")
+    return _update_rows(session, Image, Image.image_id, rows)
 
+@invalidates('images')
 @with_session(commit=True)
 def delete_image(image_id, *, session):
-    image = session.query(Image).filter(Image.image_id == image_id).first()
-    if image:
-        session.delete(image)
+    return _delete_chunked(session, Image, Image.image_id, [image_id])
 
+@invalidates('images')
+@with_session(commit=True)
+def delete_images(ids, *, session):
+    return _delete_chunked(session, Image, Image.image_id, ids)
+
+
+@cached('experiments', 'runs', 'images')
+@with_session()
+def get_stats(*, session):
+    stats = {
+        'experiments': session.execute(select(func.count()).select_from(Experiment)).scalar(),
+        'runs': session.execute(select(func.count()).select_from(Run)).scalar(),
+        'images': session.execute(select(func.count()).select_from(Image)).scalar(),
+    }
+    accuracy = session.execute(
+        select(func.avg(Run.accuracy), func.min(Run.accuracy), func.max(Run.accuracy),
+               func.count().filter(Run.flagged.is_(True)))
+    ).one()
+    stats['accuracy_avg'], stats['accuracy_min'], stats['accuracy_max'], stats['runs_flagged'] = accuracy
+    stats['images_by_attack_type'] = {
+        attack_type.value: count for attack_type, count in session.execute(
+            select(Image.attack_type, func.count()).group_by(Image.attack_type).order_by(Image.attack_type)
+        )
+    }
+    stats['images_by_file_ext'] = {
+        file_ext: count for file_ext, count in session.execute(
+            select(Image.file_ext, func.count()).group_by(Image.file_ext).order_by(Image.file_ext)
+        )
+    }
+    return stats
 
 def insert_test_data():
-    for exp in experiments_data:
-        create_experiment(**exp)
-    for rn in runs_data:
-        create_run(**rn)
-    for img in images_data:
-        create_image(**img)
+    with db.database.unit_of_work():
+        create_experiments_bulk(experiments_data)
+        create_runs_bulk(runs_data)
+        create_images_bulk(images_data)
 
 
@@ -20,8 +20,6 @@ def change_err(self):
 ValidationError.__str__ = change_err #я должен сидеть за это в тюрьме
 
 
-
-logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
@@ -32,9 +30,6 @@ def log_validation_errors(field_name: str = None):
             try:
                 return func(cls, v)
             except Exception as e:
-                from gui.logger_widget import initialize_qt_logger, _qt_handler
-                if _qt_handler is None:
-                    initialize_qt_logger()
                 field = field_name or func.__name__.replace('validate_', '').replace('_non_empty', '')
                 error_logger = logging.getLogger('validation')
                 error_logger.error(f"Validation error for field '{field}': {e}")
@@ -65,7 +60,7 @@ class ImageCreate(BaseModel):
 
     @validator("file_path")
     @log_validation_errors("file_path")
-    def file_path(cls, v: str):
+    def file_path_not_empty(cls, v: str):
         v2 = v.strip()
         if not v2: raise ValueError("file_path не может быть пустой строкой")
         if len(v2) > 500: raise ValueError("file_path длиннее 500 символов")
@@ -74,14 +69,14 @@ class ImageCreate(BaseModel):
 
     @validator("original_name")
     @log_validation_errors("original_name")
-    def original_name(cls, v: Optional[str]):
+    def original_name_strip(cls, v: Optional[str]):
         if v is None: return None
         vv = v.strip()
         return vv if vv != "" else None
 
     @validator("added_date", pre=True, always=False)
     @log_validation_errors("added_date")
-    def added_date(cls, v: Optional[datetime]):
+    def added_date_not_future(cls, v: Optional[datetime]):
         if v is None: return None
         if not isinstance(v, datetime): raise ValueError("added_date должен быть datetime")
         dt = dt_to_utc(v)
@@ -122,7 +117,7 @@ class RunCreate(BaseModel):
 
     @validator("run_date", pre=True, always=False)
     @log_validation_errors("run_date")
-    def run_date(cls, v: Optional[datetime]):
+    def run_date_not_future(cls, v: Optional[datetime]):
         if v is None: return None
         if not isinstance(v, datetime): raise ValueError("run_date должен быть datetime")
         dt = dt_to_utc(v)
@@ -131,7 +126,7 @@ class RunCreate(BaseModel):
 
     @validator("accuracy")
     @log_validation_errors("accuracy")
-    def accuracy(cls, v: Optional[float]):
+    def accuracy_range(cls, v: Optional[float]):
         if v is None: return None
         try:
             fv = float(v)
@@ -150,6 +145,13 @@ class RunEdit(BaseModel):
     accuracy: float
     flagged: bool
 
+    # те же границы, что при создании: update_runs_bulk проверяет поля по одному через validate_assignment
+    @validator("accuracy")
+    @log_validation_errors("accuracy")
+    def accuracy_range(cls, v: float):
+        if not (0.0 <= v <= 1.0): raise ValueError("accuracy должно быть в диапазоне [0.0, 1.0]")
+        return v
+
 class ExperimentCreate(BaseModel):
     experiment_id: Optional[int] = None
     name: str = Field(..., max_length=255)
@@ -174,7 +176,7 @@ class ExperimentCreate(BaseModel):
 
     @validator("created_date", pre=True, always=False)
     @log_validation_errors("created_date")
-    def created_date(cls, v: Optional[date]):
+    def created_date_not_future(cls, v: Optional[date]):
         if v is None:
             return None
         if not isinstance(v, date): raise ValueError("created_date должен быть date")
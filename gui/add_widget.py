@@ -6,9 +6,11 @@ from PySide6.QtWidgets import (QMainWindow, QPushButton, QWidget, QVBoxLayout,
                                QHBoxLayout, QFileDialog, QMessageBox, QComboBox, QTableWidget, QTableWidgetItem,
                                QHeaderView, QSplitter, QSizePolicy)
 from db.models import AttackTypeEnum
-from db.requests import create_experiment, get_experiment_max_id, get_run_max_id, create_run, create_image
+from db.importer import import_images_manifest
+from db.requests import create_experiment, get_experiment_max_id, get_run_max_id, create_run, create_images_bulk
 from gui.logger_widget import initialize_qt_logger, get_qt_logger_widget
 from gui.styles import styles
+from gui.workers import JobRunner
 
 
 
@@ -120,6 +122,9 @@ class ChoiceDialog(QDialog):
         self.setWindowTitle("Выберите действие")
         self.setStyleSheet(styles)
 
+        self.runner = JobRunner(self)
+        self.runner.bind_busy_cursor(self)
+
         layout = QVBoxLayout()
 
         btn_experiment = QPushButton("Создать эксперимент")
@@ -131,18 +136,48 @@ class ChoiceDialog(QDialog):
         btn_image = QPushButton("Добавить изображение")
         btn_image.clicked.connect(lambda: self.open_form(ImageForm))
 
+        self.btn_manifest = QPushButton("Импорт манифеста")
+        self.btn_manifest.clicked.connect(self.import_manifest)
+
         layout.addWidget(btn_experiment)
         layout.addWidget(btn_run)
         layout.addWidget(btn_image)
+        layout.addWidget(self.btn_manifest)
 
         self.setLayout(layout)
 
+    def import_manifest(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Выберите манифест", "",
+            "Manifest Files (*.csv *.jsonl *.ndjson)"
+        )
+        if not file_path:
+            return
+        self.btn_manifest.setEnabled(False)
+        self.runner.submit('manifest', import_images_manifest, file_path,
+                           on_result=self.on_import_finished, on_error=self.on_import_failed,
+                           on_progress=lambda processed: self.btn_manifest.setText(f"Импорт... {processed}"))
+
+    def on_import_failed(self, e):
+        self.btn_manifest.setEnabled(True)
+        self.btn_manifest.setText("Импорт манифеста")
+        QMessageBox.critical(self, "Ошибка", f"Не удалось импортировать манифест: {str(e)}")
+
+    def on_import_finished(self, result):
+        self.btn_manifest.setEnabled(True)
+        self.btn_manifest.setText("Импорт манифеста")
+        message = f"Добавлено изображений: {result['inserted']}\nОтклонено строк: {result['rejected']}"
+        if result['rejects_path']:
+            message += f"\nОтклонённые строки: {result['rejects_path']}"
+        QMessageBox.information(self, "Импорт манифеста", message)
+
 
 class ExperimentForm(QDialog):
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Создать эксперимент")
+        self.runner = JobRunner(self)
         self.setup_ui()
         self.setStyleSheet(styles)
 
@@ -150,7 +185,9 @@ class ExperimentForm(QDialog):
         layout = QVBoxLayout()
 
         layout.addWidget(QLabel("Номер эксперимента:"))
-        self.number_edit = QLineEdit(str(get_experiment_max_id()+1))
+        self.number_edit = QLineEdit("...")
+        self.runner.submit('max_id', get_experiment_max_id,
+                           on_result=lambda max_id: self.number_edit.setText(str(max_id + 1)))
         self.number_edit.setReadOnly(True)
         self.number_edit.setStyleSheet("background-color: #f0f0f0; color: #666666;")
         layout.addWidget(self.number_edit)
@@ -168,6 +205,7 @@ class ExperimentForm(QDialog):
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
+        self.runner.busy_changed.connect(lambda busy: button_box.setEnabled(not busy))
         layout.addWidget(button_box)
 
         self.setLayout(layout)
@@ -181,11 +219,14 @@ class ExperimentForm(QDialog):
 
     def accept(self):
         data = self.get_data()
-        try:
-            create_experiment(name=data['name'], description=data['description'])
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось создать эксперимент: {str(e)}")
+        self.runner.submit('create', create_experiment, name=data['name'], description=data['description'],
+                           on_result=self.on_created, on_error=self.on_create_failed)
 
+    def on_created(self, result):
+        super().accept()
+
+    def on_create_failed(self, e):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось создать эксперимент: {str(e)}")
         super().accept()
 
 
@@ -194,10 +235,13 @@ class RunForm(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Создать прогон")
         self.setStyleSheet(styles)
+        self.runner = JobRunner(self)
 
         layout = QVBoxLayout()
         layout.addWidget(QLabel("Номер прогона:"))
-        self.number_edit = QLineEdit(str(get_run_max_id()+1))
+        self.number_edit = QLineEdit("...")
+        self.runner.submit('max_id', get_run_max_id,
+                           on_result=lambda max_id: self.number_edit.setText(str(max_id + 1)))
         self.number_edit.setReadOnly(True)
         self.number_edit.setStyleSheet("background-color: #f0f0f0; color: #666666;")
         layout.addWidget(self.number_edit)
@@ -221,6 +265,7 @@ class RunForm(QDialog):
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
+        self.runner.busy_changed.connect(lambda busy: button_box.setEnabled(not busy))
         layout.addWidget(button_box)
 
         self.setLayout(layout)
@@ -234,11 +279,14 @@ class RunForm(QDialog):
 
     def accept(self):
         data = self.get_data()
-        try:
-            create_run(experiment_id=data['experiment_id'], accuracy=data['accuracy'], flagged=data['flagged'])
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось создать прогон: {str(e)}")
+        self.runner.submit('create', create_run, experiment_id=data['experiment_id'], accuracy=data['accuracy'],
+                           flagged=data['flagged'], on_result=self.on_created, on_error=self.on_create_failed)
+
+    def on_created(self, result):
+        super().accept()
 
+    def on_create_failed(self, e):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось создать прогон: {str(e)}")
         super().accept()
 
 
@@ -252,6 +300,8 @@ class ImageForm(QDialog):
         self.drawing = False
         self.start_point = None
         self.current_rect = None
+        self.runner = JobRunner(self)
+        self.runner.bind_busy_cursor(self)
         self.setup_ui()
         self.setStyleSheet(styles)
 
@@ -323,6 +373,7 @@ class ImageForm(QDialog):
         )
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
+        self.runner.busy_changed.connect(lambda busy: button_box.setEnabled(not busy))
         main_layout.addWidget(button_box)
 
         self.setLayout(main_layout)
@@ -473,12 +524,18 @@ class ImageForm(QDialog):
     def accept(self):
         try:
             data = self.get_data()
-            create_image(run_id=data['run_id'],
-                         file_path=data['image_path'],
-                         attack_type=data['attack_type'],
-                         original_name=data['image_name'],
-                         coordinates=[data['center_x'], data['center_y'],data['width'],data['height']])
         except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось добавить изображение: {str(e)}")
+            self.on_create_failed(e)
+            return
+        row = {'run_id': data['run_id'], 'file_path': data['image_path'], 'attack_type': data['attack_type'],
+               'original_name': data['image_name'],
+               'coordinates': [data['center_x'], data['center_y'], data['width'], data['height']]}
+        self.runner.submit('create', create_images_bulk, [row],
+                           on_result=self.on_created, on_error=self.on_create_failed)
 
-        super().accept()
\ No newline at end of file
+    def on_created(self, result):
+        super().accept()
+
+    def on_create_failed(self, e):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось добавить изображение: {str(e)}")
+        super().accept()
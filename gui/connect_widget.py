@@ -1,14 +1,20 @@
 
 from PySide6.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QHBoxLayout, QVBoxLayout, QPushButton,
-    QLabel, QMessageBox
+    QLabel, QMessageBox, QComboBox, QCheckBox, QSpinBox
 )
 from PySide6.QtCore import Qt, Signal
 
-from db.config import Settings, settings
-from db.database import perform_connection, perform_recreate_tables
-from db.requests import insert_test_data
 from gui.styles import styles
+from gui.workers import JobRunner
+
+# поле диалога, настройка движка, диапазон значений
+POOL_FIELDS = (
+    ("Размер пула:", 'DB_POOL_SIZE', (1, 100)),
+    ("Сверх пула:", 'DB_MAX_OVERFLOW', (0, 100)),
+    ("Пересоздание, с:", 'DB_POOL_RECYCLE', (-1, 86400)),
+    ("Таймаут запроса, мс:", 'DB_STATEMENT_TIMEOUT_MS', (0, 3600000)),
+)
 
 
 class ConnectionDialog(QDialog):
@@ -26,6 +32,10 @@ class ConnectionDialog(QDialog):
         self._recreate_callback = recreate_callback
         self._connected = bool(self.__class__._ever_connected)
         self._connection_info = dict(self.__class__._last_connection_info)
+        self._engine_options = {}
+
+        self.runner = JobRunner(self)
+        self.runner.bind_busy_cursor(self)
 
         self.init_ui()
         self.connect_signals()
@@ -39,6 +49,18 @@ class ConnectionDialog(QDialog):
         self.port_edit = QLineEdit()
         self.name_edit = QLineEdit()
         self.user_edit = QLineEdit()
+        self.echo_combo = QComboBox()
+        for level in ("off", "info", "debug"):
+            self.echo_combo.addItem(level, level)
+        self.pgbouncer_checkbox = QCheckBox("PgBouncer")
+        from db.config import EngineOptions
+        defaults = EngineOptions()
+        self.pool_spins = {}
+        for _, name, (minimum, maximum) in POOL_FIELDS:
+            spin = QSpinBox()
+            spin.setRange(minimum, maximum)
+            spin.setValue(getattr(defaults, name))
+            self.pool_spins[name] = spin
 
         form = QFormLayout()
         form.addRow("DB_PASSWORD:", self.password_edit)
@@ -46,6 +68,10 @@ class ConnectionDialog(QDialog):
         form.addRow("DB_PORT:", self.port_edit)
         form.addRow("DB_NAME:", self.name_edit)
         form.addRow("DB_USER:", self.user_edit)
+        form.addRow("DB_ECHO:", self.echo_combo)
+        form.addRow("Пул:", self.pgbouncer_checkbox)
+        for title, name, _ in POOL_FIELDS:
+            form.addRow(title, self.pool_spins[name])
 
         self.connect_btn = QPushButton("Подключиться")
         self.recreate_btn = QPushButton("Пересоздать таблицы")
@@ -73,7 +99,13 @@ class ConnectionDialog(QDialog):
         self.load_env_btn.clicked.connect(self.on_load_env_clicked)
 
     def on_load_env_clicked(self):
+        from db.config import get_settings
 
+        try:
+            settings = get_settings()
+        except Exception as exc:
+            QMessageBox.warning(self, "Переменные окружения", f"Не удалось прочитать настройки: {exc}")
+            return
 
         env_values = {
             'DB_PASSWORD': getattr(settings, 'DB_PASSWORD', None),
@@ -83,6 +115,13 @@ class ConnectionDialog(QDialog):
             'DB_USER': getattr(settings, 'DB_USER', None),
         }
 
+        engine_options = settings.engine_options()
+        self._engine_options = engine_options.model_dump()
+        self.echo_combo.setCurrentIndex(self.echo_combo.findData(engine_options.DB_ECHO))
+        self.pgbouncer_checkbox.setChecked(engine_options.DB_PGBOUNCER)
+        for name, spin in self.pool_spins.items():
+            spin.setValue(getattr(engine_options, name))
+
         mapping = {
             'DB_PASSWORD': self.password_edit,
             'DB_HOST': self.host_edit,
@@ -119,15 +158,17 @@ class ConnectionDialog(QDialog):
         self.set_actions_enabled(False)
         self.status_label.setText("Подключение...")
 
-        try:
-            if self._connect_callback is not None:
-                result = self._connect_callback(params)
-            else:
-                result = perform_connection(params)
-        except Exception as exc:
-            #QMessageBox.critical(self, "Ошибка при подключении", f"{type(exc).__name__}: {exc}")
-            result = False
+        params.update(self.get_engine_params())
+        if self._connect_callback is not None:
+            connect = self._connect_callback
+        else:
+            from db.database import perform_connection
+            connect = perform_connection
+        self.runner.submit('connect', connect, params,
+                           on_result=lambda result: self.on_connect_finished(params, result),
+                           on_error=lambda exc: self.on_connect_finished(params, False, exc))
 
+    def on_connect_finished(self, params, result, error=None):
         if result:
             self._connected = True
             self._connection_info = params.copy()
@@ -141,7 +182,7 @@ class ConnectionDialog(QDialog):
             self._connected = False
             self._connection_info = {}
             self.status_label.setText("Не удалось подключиться.")
-            QMessageBox.critical(self, "Подключение", "Подключение не удалось.")
+            QMessageBox.critical(self, "Подключение", f"Подключение не удалось: {error}" if error else "Подключение не удалось.")
 
         self.set_actions_enabled(True)
 
@@ -153,33 +194,48 @@ class ConnectionDialog(QDialog):
         self.set_actions_enabled(False)
         self.status_label.setText("Пересоздание таблиц...")
 
-        try:
-            if self._recreate_callback is not None:
-                result = self._recreate_callback(self._connection_info)
-            else:
-                result = perform_recreate_tables()
-
-            if result:
-                self.status_label.setText("Таблицы пересозданы успешно.")
-
-                msg_box = QMessageBox(self)
-                msg_box.setWindowTitle("Пересоздание таблиц")
-                msg_box.setText("Таблицы успешно пересозданы.")
-                msg_box.setIcon(QMessageBox.Information)
-                msg_box.addButton(QMessageBox.Ok)
-                btn_save = msg_box.addButton("внести тестовые данные", QMessageBox.ActionRole)
-                msg_box.exec()
-                if msg_box.clickedButton() == btn_save:
-                    insert_test_data()
-            else:
-                self.status_label.setText("Не удалось пересоздать таблицы.")
-                QMessageBox.critical(self, "Пересоздание таблиц", "Пересоздание не выполнено.")
-        except Exception as exc:
-            self.status_label.setText("Ошибка при пересоздании таблиц.")
-            QMessageBox.critical(self, "Ошибка при пересоздании таблиц", f"{type(exc).__name__}: {exc}")
-        finally:
+        if self._recreate_callback is not None:
+            self.runner.submit('recreate', self._recreate_callback, self._connection_info,
+                               on_result=self.on_recreate_finished, on_error=self.on_recreate_failed)
+        else:
+            from db.database import perform_recreate_tables
+            self.runner.submit('recreate', perform_recreate_tables,
+                               on_result=self.on_recreate_finished, on_error=self.on_recreate_failed)
+
+    def on_recreate_finished(self, result):
+        if not result:
+            self.status_label.setText("Не удалось пересоздать таблицы.")
+            QMessageBox.critical(self, "Пересоздание таблиц", "Пересоздание не выполнено.")
+            self.set_actions_enabled(True)
+            return
+
+        self.status_label.setText("Таблицы пересозданы успешно.")
+
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Пересоздание таблиц")
+        msg_box.setText("Таблицы успешно пересозданы.")
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.addButton(QMessageBox.Ok)
+        btn_save = msg_box.addButton("внести тестовые данные", QMessageBox.ActionRole)
+        msg_box.exec()
+        if msg_box.clickedButton() == btn_save:
+            from db.requests import insert_test_data
+            self.status_label.setText("Внесение тестовых данных...")
+            self.runner.submit('test_data', insert_test_data,
+                               on_result=lambda result: self.on_test_data_finished(),
+                               on_error=self.on_recreate_failed)
+        else:
             self.set_actions_enabled(True)
 
+    def on_test_data_finished(self):
+        self.status_label.setText("Тестовые данные внесены.")
+        self.set_actions_enabled(True)
+
+    def on_recreate_failed(self, exc):
+        self.status_label.setText("Ошибка при пересоздании таблиц.")
+        QMessageBox.critical(self, "Ошибка при пересоздании таблиц", f"{type(exc).__name__}: {exc}")
+        self.set_actions_enabled(True)
+
     def set_actions_enabled(self, enabled: bool):
         edits_enabled = enabled and (not self._connected)
 
@@ -188,6 +244,10 @@ class ConnectionDialog(QDialog):
         self.port_edit.setEnabled(edits_enabled)
         self.name_edit.setEnabled(edits_enabled)
         self.user_edit.setEnabled(edits_enabled)
+        self.echo_combo.setEnabled(edits_enabled)
+        self.pgbouncer_checkbox.setEnabled(edits_enabled)
+        for spin in self.pool_spins.values():
+            spin.setEnabled(edits_enabled)
 
         self.connect_btn.setEnabled(enabled and (not self._connected))
         self.recreate_btn.setEnabled(enabled and self._connected)
@@ -212,4 +272,12 @@ class ConnectionDialog(QDialog):
             'DB_PORT': self.port_edit.text(),
             'DB_NAME': self.name_edit.text(),
             'DB_USER': self.user_edit.text()
-        }
\ No newline at end of file
+        }
+
+    def get_engine_params(self):
+        params = dict(self._engine_options)
+        params['DB_ECHO'] = self.echo_combo.currentData()
+        params['DB_PGBOUNCER'] = self.pgbouncer_checkbox.isChecked()
+        for name, spin in self.pool_spins.items():
+            params[name] = spin.value()
+        return params
\ No newline at end of file
@@ -1,15 +1,27 @@
+import atexit
+import copy
 import logging
-from PySide6.QtWidgets import (QApplication, QMainWindow, QTextEdit, QVBoxLayout,
-                               QWidget, QPushButton, QHBoxLayout, QLabel)
-from PySide6.QtCore import Qt, QObject, Signal
+import queue
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from PySide6.QtWidgets import (QApplication, QMainWindow, QPlainTextEdit, QVBoxLayout,
+                               QWidget, QPushButton, QHBoxLayout, QLabel, QComboBox)
+from PySide6.QtCore import Qt, QObject, Signal, QTimer
 from typing import Optional
 from datetime import datetime
 
 from gui.styles import styles
 
+LOG_MAX_LINES = 5000
+LOG_FLUSH_INTERVAL_MS = 100
+LOG_QUEUE_SIZE = 10000
+LOG_BUFFER_LIMIT = 1000
+LOG_LEVELS = (("Все", logging.NOTSET), ("INFO", logging.INFO), ("WARNING", logging.WARNING), ("ERROR", logging.ERROR))
+
 
 class LogEmitter(QObject):
-    log_signal = Signal(str)
+    log_signal = Signal(int, str)
 
 
 class LoggerWidget(QWidget):
@@ -19,8 +31,10 @@ class LoggerWidget(QWidget):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(5, 5, 5, 5)
 
-        self.log_text_edit = QTextEdit()
+        self.log_text_edit = QPlainTextEdit()
         self.log_text_edit.setReadOnly(True)
+        self.log_text_edit.setMaximumBlockCount(LOG_MAX_LINES)
+        self.log_text_edit.setUndoRedoEnabled(False)
         layout.addWidget(self.log_text_edit)
 
         button_layout = QHBoxLayout()
@@ -29,10 +43,34 @@ class LoggerWidget(QWidget):
         clear_btn.clicked.connect(self.clear_logs)
         button_layout.addWidget(clear_btn)
 
+        self.pause_btn = QPushButton("Пауза")
+        self.pause_btn.setCheckable(True)
+        self.pause_btn.toggled.connect(self.set_paused)
+        button_layout.addWidget(self.pause_btn)
+
+        self.level_combo = QComboBox()
+        for title, level in LOG_LEVELS:
+            self.level_combo.addItem(title, level)
+        self.level_combo.currentIndexChanged.connect(self.rerender)
+        button_layout.addWidget(self.level_combo)
+
+        self.status_label = QLabel()
+        button_layout.addWidget(self.status_label)
+
         button_layout.addStretch()
 
         layout.addLayout(button_layout)
 
+        # history - последние строки для перерисовки при смене уровня, pending - еще не выведенные
+        self._history = deque(maxlen=LOG_MAX_LINES)
+        self._pending = deque(maxlen=LOG_MAX_LINES)
+        self._skipped = 0
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(LOG_FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush)
+
         self.log_emitter = LogEmitter()
         self.log_emitter.log_signal.connect(self.append_log)
 
@@ -42,17 +80,63 @@ class LoggerWidget(QWidget):
     def add_startup_message(self):
         startup_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         welcome_message = f"Логгер запущен {startup_time}"
-        self.log_text_edit.append(welcome_message)
-
-    def append_log(self, message: str):
-        self.log_text_edit.append(message)
-        self.log_text_edit.verticalScrollBar().setValue(
-            self.log_text_edit.verticalScrollBar().maximum()
-        )
+        self.append_log(logging.INFO, welcome_message)
+
+    def append_log(self, level: int, message: str):
+        if len(self._pending) == self._pending.maxlen:
+            self._skipped += 1
+        self._history.append((level, message))
+        self._pending.append((level, message))
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        if self.pause_btn.isChecked() or not self._pending:
+            self.update_status()
+            return
+        min_level = self.level_combo.currentData()
+        lines = [message for level, message in self._pending if level >= min_level]
+        self._pending.clear()
+        if lines:
+            self._write(lines)
+        self.update_status()
+
+    def _write(self, lines):
+        scrollbar = self.log_text_edit.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        self.log_text_edit.appendPlainText("\n".join(lines[-LOG_MAX_LINES:]))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def rerender(self):
+        self._pending.clear()
+        self.log_text_edit.clear()
+        min_level = self.level_combo.currentData()
+        lines = [message for level, message in self._history if level >= min_level]
+        if lines:
+            self._write(lines)
+
+    def set_paused(self, paused):
+        self.pause_btn.setText("Продолжить" if paused else "Пауза")
+        if not paused:
+            self.flush()
+        self.update_status()
+
+    def update_status(self):
+        text = []
+        if self.pause_btn.isChecked():
+            text.append(f"в очереди: {len(self._pending)}")
+        if self._skipped:
+            text.append(f"пропущено: {self._skipped}")
+        self.status_label.setText(", ".join(text))
 
     def clear_logs(self):
+        self._history.clear()
+        self._pending.clear()
+        self._skipped = 0
         self.log_text_edit.clear()
         self.add_startup_message()
+        self.flush()
 
 
 class QtLoggerHandler(logging.Handler):
@@ -60,30 +144,59 @@ class QtLoggerHandler(logging.Handler):
         super().__init__()
         self.log_emitter = LogEmitter()
         self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        self._log_buffer = []
+        # записи до появления окна логов: храним последние, остальные только считаем
+        self._log_buffer = deque(maxlen=LOG_BUFFER_LIMIT)
+        self._buffer_lock = threading.Lock()
+        self.log_widget = None
+        self.dropped = 0
 
     def set_log_widget(self, log_widget: LoggerWidget):
-        self.log_widget = log_widget
-        self.log_emitter.log_signal.connect(self.log_widget.append_log)
-        for log_message in self._log_buffer:
-            self.log_emitter.log_signal.emit(log_message)
-        self._log_buffer.clear()
+        with self._buffer_lock:
+            self.log_widget = log_widget
+            self.log_emitter.log_signal.connect(self.log_widget.append_log)
+            if self.dropped:
+                self.log_emitter.log_signal.emit(logging.WARNING, f"до открытия окна логов пропущено сообщений: {self.dropped}")
+            for level, log_message in self._log_buffer:
+                self.log_emitter.log_signal.emit(level, log_message)
+            self._log_buffer.clear()
 
     def emit(self, record):
         try:
             log_message = self.format(record)
-            if hasattr(self, 'log_widget') and self.log_widget:
-                self.log_emitter.log_signal.emit(log_message)
-            else:
-                self._log_buffer.append(log_message)
+            with self._buffer_lock:
+                if self.log_widget is not None:
+                    self.log_emitter.log_signal.emit(record.levelno, log_message)
+                    return
+                if len(self._log_buffer) == self._log_buffer.maxlen:
+                    self.dropped += 1
+                self._log_buffer.append((record.levelno, log_message))
         except Exception:
             pass
 
 
+class DroppingQueueHandler(QueueHandler):
+    # не блокирует вызывающий поток: при переполненной очереди запись отбрасывается
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # базовый prepare форматирует запись в вызывающем потоке; здесь только копия, формат - в слушателе
+        return copy.copy(record)
+
+
 logger_widget = None
 _qt_handler = None
+_queue_handler = None
+_listener = None
 def initialize_qt_logger():
-    global _qt_handler
+    global _qt_handler, _queue_handler, _listener
 
     if _qt_handler is None:
         _qt_handler = QtLoggerHandler()
@@ -92,10 +205,16 @@ def initialize_qt_logger():
 
         for logger in (root_logger, logging.getLogger('validation')):
             for handler in logger.handlers[:]:
-                if isinstance(handler, QtLoggerHandler):
+                if isinstance(handler, (QtLoggerHandler, DroppingQueueHandler)):
                     logger.removeHandler(handler)
 
-        root_logger.addHandler(_qt_handler)
+        # форматирование и передача в Qt идут в потоке слушателя, а не в потоке, который пишет лог
+        _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _listener = QueueListener(_queue_handler.queue, _qt_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root_logger.addHandler(_queue_handler)
         root_logger.setLevel(logging.INFO)
 
         validation_logger = logging.getLogger('validation')
@@ -104,6 +223,14 @@ def initialize_qt_logger():
     return _qt_handler
 
 
+def get_logging_stats():
+    return {
+        'queue_dropped': _queue_handler.dropped if _queue_handler else 0,
+        'buffer_dropped': _qt_handler.dropped if _qt_handler else 0,
+        'queued': _queue_handler.queue.qsize() if _queue_handler else 0,
+    }
+
+
 def get_qt_logger_widget(parent_widget=None):
     global logger_widget
 
@@ -117,4 +244,3 @@ def get_qt_logger_widget(parent_widget=None):
 
 def setup_logging():
     initialize_qt_logger()
-
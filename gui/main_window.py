@@ -1,16 +1,17 @@
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (QMainWindow, QPushButton, QWidget, QVBoxLayout,
                                )
-from gui.add_widget import ChoiceDialog, MergeAddWindows
 from gui.connect_widget import ConnectionDialog
 from gui.styles import styles
-from gui.view_widget import ViewDialog, MergeViewWindows
 
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.logger_window = None
+        self.add_window = None
+        self.view_window = None
+        self.stats_window = None
         self.setWindowTitle("Главное окно")
         self.setFixedSize(400, 300)
         central_widget = QWidget()
@@ -32,6 +33,10 @@ class MainWindow(QMainWindow):
         self.view_btn.clicked.connect(self.open_view)
         layout.addWidget(self.view_btn)
 
+        self.stats_btn = QPushButton("Статистика запросов")
+        self.stats_btn.clicked.connect(self.open_stats)
+        layout.addWidget(self.stats_btn)
+
         self._update_ui_state()
 
     def _update_ui_state(self):
@@ -44,6 +49,7 @@ class MainWindow(QMainWindow):
 
         self.add_btn.setEnabled(ever_connected)
         self.view_btn.setEnabled(ever_connected)
+        self.stats_btn.setEnabled(ever_connected)
         self.connect_btn.setEnabled(True)
 
     def open_connection(self):
@@ -53,12 +59,25 @@ class MainWindow(QMainWindow):
         self._update_ui_state()
 
     def _on_db_connected(self, connection_info):
+        from gui.notifier import get_change_notifier
+        get_change_notifier().start()
         self._update_ui_state()
 
     def open_dialog(self):
-        dialog = MergeAddWindows()
-        dialog.show()
+        if self.add_window is None:
+            from gui.add_widget import MergeAddWindows
+            self.add_window = MergeAddWindows()
+        self.add_window.show()
 
     def open_view(self):
-        dialog = MergeViewWindows()
-        dialog.show()
\ No newline at end of file
+        if self.view_window is None:
+            from gui.view_widget import MergeViewWindows
+            self.view_window = MergeViewWindows()
+        self.view_window.show()
+
+    def open_stats(self):
+        if self.stats_window is None:
+            from gui.stats_dialog import QueryStatsDialog
+            self.stats_window = QueryStatsDialog(self)
+        self.stats_window.show()
+        self.stats_window.raise_()
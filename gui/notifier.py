@@ -0,0 +1,52 @@
+from PySide6.QtCore import QObject, QTimer, Signal, Qt
+
+from db.notifications import start_listener, stop_listener
+
+NOTIFY_BATCH_MS = 300
+
+
+class ChangeNotifier(QObject):
+    # table, множество id или None, если нужно перечитать всю таблицу
+    changed = Signal(str, object)
+    _received = Signal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pending = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(NOTIFY_BATCH_MS)
+        self._timer.timeout.connect(self.flush)
+        self._received.connect(self._on_received, Qt.QueuedConnection)
+
+    def start(self):
+        start_listener(lambda table, op, ids: self._received.emit(table, ids))
+
+    def stop(self):
+        stop_listener()
+
+    def _on_received(self, table, ids):
+        # пачка уведомлений (например, при импорте) превращается в одно обновление на таблицу
+        if table in self._pending and self._pending[table] is None:
+            pass
+        elif ids is None:
+            self._pending[table] = None
+        else:
+            self._pending.setdefault(table, set()).update(ids)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        pending, self._pending = self._pending, {}
+        for table, ids in pending.items():
+            self.changed.emit(table, ids)
+
+
+_notifier = None
+
+
+def get_change_notifier():
+    global _notifier
+    if _notifier is None:
+        _notifier = ChangeNotifier()
+    return _notifier
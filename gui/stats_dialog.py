@@ -0,0 +1,94 @@
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QTableWidget,
+                               QTableWidgetItem, QHeaderView, QAbstractItemView)
+
+from db.cache import get_cache_stats
+from db.database import get_pool_stats
+from db.instrumentation import get_query_stats, reset_query_stats
+from gui.logger_widget import get_logging_stats
+from gui.styles import styles
+
+REFRESH_INTERVAL_MS = 2000
+HOTTEST_QUERIES = 30
+
+COLUMNS = (
+    ("Функция", 'operation', None),
+    ("Вызовов", 'calls', "{}"),
+    ("Всего, мс", 'total_ms', "{:.1f}"),
+    ("Среднее, мс", 'mean_ms', "{:.2f}"),
+    ("p50, мс", 'p50_ms', "{:.2f}"),
+    ("p95, мс", 'p95_ms', "{:.2f}"),
+    ("p99, мс", 'p99_ms', "{:.2f}"),
+    ("Макс, мс", 'max_ms', "{:.2f}"),
+    ("Строк", 'rows', "{}"),
+    ("Запрос", 'statement', None),
+)
+
+
+class QueryStatsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Статистика запросов")
+        self.resize(1100, 500)
+        self.setStyleSheet(styles)
+
+        layout = QVBoxLayout(self)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for title, _, _ in COLUMNS])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        header = self.table.horizontalHeader()
+        for column in range(len(COLUMNS) - 1):
+            header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(len(COLUMNS) - 1, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Обновить")
+        refresh_btn.clicked.connect(self.refresh)
+        button_layout.addWidget(refresh_btn)
+        reset_btn = QPushButton("Сбросить")
+        reset_btn.clicked.connect(self.reset_stats)
+        button_layout.addWidget(reset_btn)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+        self.refresh()
+
+    def refresh(self):
+        queries = get_query_stats(limit=HOTTEST_QUERIES)
+        self.table.setRowCount(len(queries))
+        for row, query in enumerate(queries):
+            for column, (_, key, fmt) in enumerate(COLUMNS):
+                value = query[key]
+                item = QTableWidgetItem(fmt.format(value) if fmt else str(value))
+                if fmt:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if key == 'statement':
+                    item.setToolTip(value)
+                self.table.setItem(row, column, item)
+
+        cache = get_cache_stats()
+        pool = get_pool_stats()
+        logs = get_logging_stats()
+        self.summary_label.setText(
+            f"Кеш: попаданий {cache['hits']}, промахов {cache['misses']} ({cache['hit_rate']:.0%}), "
+            f"записей {cache['entries']}, строк {cache['rows']}    "
+            f"Пул: выдано {pool.get('checkedout', '-')}, свободно {pool.get('checkedin', '-')}, "
+            f"подключений {pool.get('connects', '-')}    "
+            f"Лог: в очереди {logs['queued']}, потеряно {logs['queue_dropped'] + logs['buffer_dropped']}"
+        )
+
+    def reset_stats(self):
+        reset_query_stats()
+        self.refresh()
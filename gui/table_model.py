@@ -0,0 +1,282 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from operator import neg
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal, QEvent, QMargins, QTimer
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QPushButton
+
+from db.cancel import QueryCancelled
+from db.requests import PAGE_SIZE
+from gui.styles import styles
+
+BUTTON_MARGIN = 4
+MAX_CACHED_ROWS = 10 * PAGE_SIZE
+
+
+class PagedTableModel(QAbstractTableModel):
+    page_failed = Signal(object)
+
+    def __init__(self, columns, fetch_page, row_values, fetch_rows=None, page_size=PAGE_SIZE, runner=None,
+                 parent=None, max_cached_rows=MAX_CACHED_ROWS):
+        super().__init__(parent)
+        self._columns = columns
+        self._fetch_page = fetch_page
+        self._row_values = row_values
+        self._fetch_rows = fetch_rows
+        self._page_size = page_size
+        self._runner = runner
+        self._max_cached_rows = max_cached_rows
+        # id всех загруженных строк занимают 8 байт на строку, значения ячеек держим только для
+        # последних просмотренных строк; вытесненные перечитываются блоками по id при прокрутке
+        self._ids = array('q')
+        self._values = OrderedDict()
+        self._requested = set()
+        self._wanted = []
+        self._failed = set()
+        self._exhausted = False
+        self._loading = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        values = self._cached_values(index.row())
+        if values is None or index.column() >= len(values):
+            return None
+        return values[index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._columns[section]
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._loading:
+            return
+        after_id = self._ids[-1] if self._ids else None
+        if self._runner is None:
+            self._append_page(self._fetch_page(after_id, self._page_size))
+            return
+        self._loading = True
+        self._runner.submit('page', self._fetch_page, after_id, self._page_size,
+                            on_result=self._append_page, on_error=self._on_page_failed, cancellable=True)
+
+    def _on_page_failed(self, error):
+        if isinstance(error, QueryCancelled):
+            # отменяет только reset, состояние модели уже сброшено
+            return
+        self._loading = False
+        self._exhausted = True
+        self.page_failed.emit(error)
+
+    def _append_page(self, items):
+        self._loading = False
+        if len(items) < self._page_size:
+            self._exhausted = True
+        if not items:
+            return
+
+        start = len(self._ids)
+        self.beginInsertRows(QModelIndex(), start, start + len(items) - 1)
+        for item in items:
+            item_id, values = self._row_values(item)
+            self._ids.append(item_id)
+            self._cache(item_id, values)
+        self.endInsertRows()
+
+    def _cache(self, item_id, values):
+        self._values[item_id] = values
+        self._values.move_to_end(item_id)
+        while len(self._values) > self._max_cached_rows:
+            self._values.popitem(last=False)
+
+    def _cached_values(self, row):
+        item_id = self._ids[row]
+        values = self._values.get(item_id)
+        if values is None:
+            self._request_block(row // self._page_size)
+            return self._values.get(item_id)
+        self._values.move_to_end(item_id)
+        return values
+
+    def _request_block(self, block):
+        if self._fetch_rows is None or block in self._requested or block in self._failed:
+            return
+        self._requested.add(block)
+        self._wanted.append(block)
+        if self._runner is None:
+            self._fetch_wanted()
+        elif len(self._wanted) == 1:
+            # блоки, запрошенные за одну перерисовку, читаем одним запросом и обновляем одним сигналом
+            QTimer.singleShot(0, self, self._fetch_wanted)
+
+    def _fetch_wanted(self):
+        blocks, self._wanted = self._wanted, []
+        if not blocks:
+            return
+        ids = [item_id for block in blocks
+               for item_id in self._ids[block * self._page_size:(block + 1) * self._page_size]]
+        if self._runner is None:
+            self._requested.difference_update(blocks)
+            self._store_rows(ids, self._fetch_rows(ids))
+            return
+        self._runner.submit(('rows', blocks[0]), self._fetch_rows, ids,
+                            on_result=lambda items: self._on_rows_fetched(blocks, ids, items),
+                            on_error=lambda error: self._on_rows_failed(blocks, error), cancellable=True)
+
+    def _store_rows(self, ids, items):
+        fresh = dict(self._row_values(item) for item in items)
+        for item_id in ids:
+            # строка могла быть удалена: пока не пришло уведомление, показываем ее пустой
+            self._cache(item_id, fresh.get(item_id, ()))
+
+    def _on_rows_fetched(self, blocks, ids, items):
+        self._requested.difference_update(blocks)
+        self._store_rows(ids, items)
+        rows = [row for row in map(self.row_of, ids) if row is not None]
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 0), self.index(max(rows), len(self._columns) - 1))
+
+    def _on_rows_failed(self, blocks, error):
+        if isinstance(error, QueryCancelled):
+            return
+        # повторять не будем до перезагрузки, иначе каждая перерисовка снова упадет с ошибкой
+        self._requested.difference_update(blocks)
+        self._failed.update(blocks)
+        self.page_failed.emit(error)
+
+    def reset(self):
+        if self._runner is not None:
+            self._runner.discard('page')
+            for block in self._requested:
+                self._runner.discard(('rows', block))
+        self.beginResetModel()
+        self._ids = array('q')
+        self._values = OrderedDict()
+        self._requested = set()
+        self._wanted = []
+        self._failed = set()
+        self._exhausted = False
+        self._loading = False
+        self.endResetModel()
+
+    def _position(self, item_id, descending):
+        # id всегда упорядочены (keyset-страницы, вставка по месту), поэтому поиск двоичный
+        if descending:
+            return bisect_left(self._ids, -item_id, key=neg)
+        return bisect_left(self._ids, item_id)
+
+    def row_of(self, item_id):
+        descending = len(self._ids) > 1 and self._ids[0] > self._ids[-1]
+        row = self._position(item_id, descending)
+        if row < len(self._ids) and self._ids[row] == item_id:
+            return row
+        return None
+
+    def update_row(self, item):
+        item_id, values = self._row_values(item)
+        row = self.row_of(item_id)
+        if row is None:
+            return False
+        self._cache(item_id, values)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._columns) - 1))
+        return True
+
+    def remove_row(self, item_id):
+        row = self.row_of(item_id)
+        if row is None:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._ids[row]
+        self._values.pop(item_id, None)
+        self.endRemoveRows()
+        return True
+
+    def apply_changes(self, ids, items, descending=False):
+        # ids - все измененные id, items - те из них, что сейчас подходят под выборку; остальные удаляем
+        fresh = dict(self._row_values(item) for item in items)
+
+        for item_id, values in fresh.items():
+            row = self.row_of(item_id)
+            if row is not None:
+                self._cache(item_id, values)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._columns) - 1))
+
+        for item_id in ids:
+            if item_id not in fresh:
+                self.remove_row(item_id)
+
+        for item_id in sorted(fresh, reverse=descending):
+            if self.row_of(item_id) is not None:
+                continue
+            row = self._position(item_id, descending)
+            # строки за последней загруженной подтянет следующая страница
+            if row == len(self._ids) and not self._exhausted:
+                continue
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._ids.insert(row, item_id)
+            self._cache(item_id, fresh[item_id])
+            self.endInsertRows()
+
+    def is_loading(self):
+        return self._loading
+
+    def item_id(self, row):
+        return self._ids[row]
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    clicked = Signal(int)
+
+    def __init__(self, text, parent=None):
+        super().__init__(parent)
+        self._text = text
+        self._pressed_row = -1
+        self._template = QPushButton(text)
+        self._template.setStyleSheet(styles)
+        self._template.hide()
+
+    def button_rect(self, option):
+        return option.rect.adjusted(BUTTON_MARGIN, BUTTON_MARGIN, -BUTTON_MARGIN, -BUTTON_MARGIN)
+
+    def sizeHint(self, option, index):
+        return self._template.sizeHint().grownBy(
+            QMargins(BUTTON_MARGIN, BUTTON_MARGIN, BUTTON_MARGIN, BUTTON_MARGIN))
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = self.button_rect(option)
+        button.text = self._text
+        button.state = QStyle.State_Enabled
+        if option.state & QStyle.State_MouseOver:
+            button.state |= QStyle.State_MouseOver
+        if index.row() == self._pressed_row:
+            button.state |= QStyle.State_Sunken
+        self._template.style().drawControl(QStyle.CE_PushButton, button, painter, self._template)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick):
+            return False
+        if event.button() != Qt.LeftButton or not self.button_rect(option).contains(event.position().toPoint()):
+            self._pressed_row = -1
+            return False
+        if event.type() == QEvent.MouseButtonRelease:
+            was_pressed = index.row() == self._pressed_row
+            self._pressed_row = -1
+            if was_pressed:
+                self.clicked.emit(index.row())
+        else:
+            self._pressed_row = index.row()
+        return True
@@ -1,17 +1,30 @@
+from functools import partial
 
 from PySide6.QtWidgets import (
     QApplication, QWidget, QHBoxLayout, QVBoxLayout, QGroupBox, QCheckBox,
-    QPushButton, QTableWidget, QTableWidgetItem, QScrollArea, QLabel, QMessageBox, QSizePolicy, QDialog, QHeaderView,
-    QAbstractItemView, QDateEdit, QTextEdit, QLineEdit, QDoubleSpinBox, QComboBox, QMainWindow, QSplitter
+    QPushButton, QTableView, QScrollArea, QLabel, QMessageBox, QSizePolicy, QDialog, QHeaderView,
+    QAbstractItemView, QDateEdit, QTextEdit, QLineEdit, QDoubleSpinBox, QComboBox, QMainWindow, QSplitter,
+    QFileDialog
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
+from db.cancel import QueryCancelled
+from db.exporter import export_experiments, export_runs, export_images
 from db.models import AttackTypeEnum
-from db.requests import get_all_experiments, update_experiment, delete_experiment, get_experiment_by_id, get_all_runs, \
-    delete_run, update_run, get_run_by_id, delete_image, update_image, get_all_images, get_image_by_id, \
-    get_all_images_filtered
+from db.requests import get_experiments_page, update_experiment, delete_experiment, get_experiment_by_id, \
+    get_runs_page, delete_run, update_run, get_run_by_id, delete_image, update_image, get_image_by_id, \
+    get_images_filtered_page, get_experiments_by_ids, get_runs_by_ids, get_images_by_ids
 from gui.logger_widget import initialize_qt_logger, get_qt_logger_widget
+from gui.notifier import get_change_notifier
 from gui.styles import styles
+from gui.table_model import PagedTableModel, ButtonDelegate
+from gui.workers import JobRunner
+
+ROW_HEIGHT = 40
+# сколько строк вокруг видимых учитывать при подгонке ширины колонок (в Qt по умолчанию 1000)
+RESIZE_SAMPLE_ROWS = 100
+CHANGE_RELOAD_THRESHOLD = 2000
+FILTER_DEBOUNCE_MS = 250
 
 
 class MergeViewWindows(QMainWindow):
@@ -142,8 +155,11 @@ class ViewDialog(QDialog):
         self.setLayout(layout)
 
 class BaseTableDialog(QDialog):
+    table_name = None
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._changed_ids = set()
         self.setMinimumSize(800, 500)
         self.init_ui()
         self.setStyleSheet(styles)
@@ -152,20 +168,151 @@ class BaseTableDialog(QDialog):
         layout = QVBoxLayout()
         layout.setContentsMargins(15, 15, 15, 15)
 
-        self.table = QTableWidget()
+        self.runner = JobRunner(self)
+        self.runner.bind_busy_cursor(self)
+        self.runner.busy_changed.connect(self.update_status)
+
+        self.model = PagedTableModel(self.get_columns(), self.fetch_page, self.row_values, self.fetch_rows,
+                                     runner=self.runner, parent=self)
+        self.model.page_failed.connect(self.on_page_failed)
+        get_change_notifier().changed.connect(self.on_rows_changed)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setFocusPolicy(Qt.NoFocus)
         self.table.setSelectionMode(QAbstractItemView.NoSelection)
         self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
         self.table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.table.setMouseTracking(True)
+
+        self.edit_delegate = ButtonDelegate("Редактировать", self.table)
+        self.edit_delegate.clicked.connect(lambda row: self.edit_item(self.model.item_id(row)))
+        self.table.setItemDelegateForColumn(self.model.columnCount() - 1, self.edit_delegate)
+
+        for column, mode in enumerate(self.get_column_modes()):
+            self.table.horizontalHeader().setSectionResizeMode(column, mode)
+        # подгонка ширины повторяется при каждой догрузке вытесненных строк, поэтому смотрим на меньшее число строк
+        self.table.horizontalHeader().setResizeContentsPrecision(RESIZE_SAMPLE_ROWS)
+
+        self.status_label = QLabel("")
+        self.export_btn = QPushButton("Экспорт")
+        self.export_btn.clicked.connect(self.export_data)
+
+        status_layout = QHBoxLayout()
+        status_layout.addWidget(self.status_label)
+        status_layout.addStretch()
+        status_layout.addWidget(self.export_btn)
 
         layout.addWidget(self.table)
+        layout.addLayout(status_layout)
         self.setLayout(layout)
 
-    def add_edit_button(self, row, item_id):
-        edit_btn = QPushButton("Редактировать")
-        edit_btn.clicked.connect(lambda checked, id=item_id: self.edit_item(id))
-        self.table.setCellWidget(row, self.table.columnCount()-1, edit_btn)
+    def load_data(self):
+        # изменения, запрошенные до перезагрузки, могли относиться к строкам по старым фильтрам
+        self._changed_ids.clear()
+        self.runner.discard('changes')
+        self.model.reset()
+        if self.model.canFetchMore():
+            self.model.fetchMore()
+
+    def update_status(self, busy):
+        if busy:
+            self.status_label.setText("Загрузка...")
+        else:
+            self.status_label.setText(f"Загружено строк: {self.model.rowCount()}")
+
+    def on_page_failed(self, error):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить данные: {str(error)}")
+
+    def export_data(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Экспорт", "", "CSV (*.csv);;JSON Lines (*.jsonl)")
+        if not path:
+            return
+        self.export_btn.setEnabled(False)
+        self.runner.submit('export', self.get_exporter(), path,
+                           on_result=self.on_export_finished, on_error=self.on_export_failed,
+                           on_progress=lambda written: self.status_label.setText(f"Экспорт... {written} строк"))
+
+    def row_visible(self, item):
+        return True
+
+    def is_descending(self):
+        return False
+
+    def on_rows_changed(self, table, ids):
+        if table != self.table_name:
+            return
+        if ids is None or len(self._changed_ids) + len(ids) > CHANGE_RELOAD_THRESHOLD:
+            self._changed_ids.clear()
+            self.load_data()
+            return
+        self._changed_ids.update(ids)
+        self.sync_changes()
+
+    def sync_changes(self):
+        # одновременно идет один запрос изменений, новые id копятся до его завершения
+        if not self._changed_ids or self.runner.is_busy('changes'):
+            return
+        ids = sorted(self._changed_ids)
+        self._changed_ids.clear()
+        self.runner.submit('changes', self.fetch_rows, ids,
+                           on_result=partial(self.on_changes_fetched, ids), on_error=self.on_changes_failed,
+                           cancellable=True)
+
+    def on_changes_fetched(self, ids, items):
+        self.model.apply_changes(ids, items, self.is_descending())
+        self.update_status(self.runner.is_busy())
+        self.sync_changes()
+
+    def on_changes_failed(self, error):
+        if isinstance(error, QueryCancelled):
+            # отменен перезагрузкой; id, пришедшие после нее, еще ждут запроса
+            self.sync_changes()
+            return
+        self.load_data()
+
+    def edit_item(self, item_id):
+        self.runner.submit('edit', self.fetch_item, item_id,
+                           on_result=partial(self.open_editor, item_id), on_error=self.on_edit_failed, cancellable=True)
+
+    def open_editor(self, item_id, item):
+        if item is None:
+            # строку удалили, пока она была на экране
+            QMessageBox.information(self, "Редактирование", "Запись уже удалена.")
+            self.model.remove_row(item_id)
+            self.update_status(self.runner.is_busy())
+            return
+        dialog = self.create_editor(item)
+        if dialog.exec() == QDialog.Accepted:
+            self.apply_edit(item_id, dialog)
+
+    def on_edit_failed(self, error):
+        if isinstance(error, QueryCancelled):
+            return
+        QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить запись: {str(error)}")
+
+    def apply_edit(self, item_id, dialog):
+        # меняем только отредактированную строку, чтобы не терять прокрутку и не перечитывать таблицу
+        if dialog.deleted or dialog.updated is None:
+            applied = self.model.remove_row(item_id)
+        elif self.row_visible(dialog.updated):
+            applied = self.model.update_row(dialog.updated)
+        else:
+            applied = self.model.remove_row(item_id)
+        if not applied:
+            self.load_data()
+        self.update_status(self.runner.is_busy())
+
+    def on_export_finished(self, written):
+        self.export_btn.setEnabled(True)
+        QMessageBox.information(self, "Экспорт", f"Выгружено строк: {written}")
+
+    def on_export_failed(self, error):
+        self.export_btn.setEnabled(True)
+        QMessageBox.critical(self, "Ошибка", f"Не удалось выполнить экспорт: {str(error)}")
 
 
 class BaseEditDialog(QDialog):
@@ -173,8 +320,13 @@ class BaseEditDialog(QDialog):
     def __init__(self, item, parent=None):
         super().__init__(parent)
         self.item = item
+        self.updated = None
+        self.deleted = False
+        self.runner = JobRunner(self)
+        self.runner.bind_busy_cursor(self)
         self.setFixedSize(600, 400)
         self.init_ui()
+        self.runner.busy_changed.connect(lambda busy: self.set_buttons_enabled(not busy))
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -197,8 +349,32 @@ class BaseEditDialog(QDialog):
         self.delete_btn.clicked.connect(self.delete_item)
         self.cancel_btn.clicked.connect(self.reject)
 
+    def set_buttons_enabled(self, enabled):
+        for button in (self.save_btn, self.delete_btn, self.cancel_btn):
+            button.setEnabled(enabled)
+
+    def submit(self, fn, *args, on_result, error_message):
+        self.runner.submit('write', fn, *args, on_result=on_result,
+                           on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"{error_message}: {str(e)}"))
+
+    def on_saved(self, updated):
+        self.updated = updated
+        self.accept()
+
+    def on_deleted(self, result):
+        self.deleted = True
+        self.accept()
+
+    def reject(self):
+        # изменение уже ушло в базу: ждем результата, иначе таблица о нем не узнает
+        if self.runner.is_busy():
+            return
+        super().reject()
+
 
 class ExperimentsTableDialog(BaseTableDialog):
+    table_name = "experiments"
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Таблица экспериментов")
@@ -207,42 +383,28 @@ class ExperimentsTableDialog(BaseTableDialog):
     def get_columns(self):
         return ["ID", "Название", "Описание", "Дата создания", "Действия"]
 
-    def load_data(self):
-        result = get_all_experiments()
-
-        self.table.setColumnCount(len(self.get_columns()))
-        self.table.setHorizontalHeaderLabels(self.get_columns())
+    def get_column_modes(self):
+        return [QHeaderView.ResizeToContents, QHeaderView.Stretch, QHeaderView.Stretch,
+                QHeaderView.ResizeToContents, QHeaderView.Stretch]
 
-        self.table.setRowCount(len(result))
+    def fetch_page(self, after_id, page_size):
+        return get_experiments_page(page_size, after_id)
 
-        for row, exp in enumerate(result):
-            id_item = QTableWidgetItem(str(exp.experiment_id))
-            name_item = QTableWidgetItem(exp.name or "")
-            desc_item = QTableWidgetItem(exp.description or "")
-            date_item = QTableWidgetItem(str(exp.created_date))
+    def fetch_rows(self, ids):
+        return get_experiments_by_ids(ids)
 
-            for item in [id_item, name_item, desc_item, date_item]:
-                item.setFlags(Qt.ItemIsEnabled)
+    def get_exporter(self):
+        return export_experiments
 
-            self.table.setItem(row, 0, id_item)
-            self.table.setItem(row, 1, name_item)
-            self.table.setItem(row, 2, desc_item)
-            self.table.setItem(row, 3, date_item)
+    def row_values(self, exp):
+        return exp.experiment_id, (str(exp.experiment_id), exp.name or "", exp.description or "",
+                                   str(exp.created_date))
 
-            self.add_edit_button(row, exp.experiment_id)
+    def fetch_item(self, experiment_id):
+        return get_experiment_by_id(experiment_id)
 
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
-
-    def edit_item(self, experiment_id):
-        experiment = get_experiment_by_id(experiment_id)
-        dialog = EditExperimentDialog(experiment, self)
-        if dialog.exec() == QDialog.Accepted:
-            self.load_data()
+    def create_editor(self, experiment):
+        return EditExperimentDialog(experiment, self)
 
 
 class EditExperimentDialog(BaseEditDialog):
@@ -280,11 +442,8 @@ class EditExperimentDialog(BaseEditDialog):
         name = self.name_edit.text()
         description = self.desc_edit.toPlainText()
 
-        try:
-            update_experiment(self.item.experiment_id, name, description)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить эксперимент: {str(e)}")
+        self.submit(update_experiment, self.item.experiment_id, name, description,
+                    on_result=self.on_saved, error_message="Не удалось обновить эксперимент")
 
     def delete_item(self):
         reply = QMessageBox.question(
@@ -296,14 +455,14 @@ class EditExperimentDialog(BaseEditDialog):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                delete_experiment(self.item.experiment_id)
-                self.accept()
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить эксперимент: {str(e)}")
+            # каскад по всем прогонам и изображениям эксперимента может идти долго
+            self.submit(delete_experiment, self.item.experiment_id,
+                        on_result=self.on_deleted, error_message="Не удалось удалить эксперимент")
 
 
 class RunsTableDialog(BaseTableDialog):
+    table_name = "runs"
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Таблица прогонов")
@@ -312,45 +471,28 @@ class RunsTableDialog(BaseTableDialog):
     def get_columns(self):
         return ["ID", "ID эксперимента", "Время запуска", "Точность", "Проверен", "Действия"]
 
-    def load_data(self):
-        result = get_all_runs()
-
-        self.table.setColumnCount(len(self.get_columns()))
-        self.table.setHorizontalHeaderLabels(self.get_columns())
-
-        self.table.setRowCount(len(result))
-
-        for row, run in enumerate(result):
-            id_item = QTableWidgetItem(str(run.run_id))
-            exp_id_item = QTableWidgetItem(str(run.experiment_id))
-            time_item = QTableWidgetItem(str(run.run_date))
-            accuracy_item = QTableWidgetItem(str(run.accuracy))
-            flagged_item = QTableWidgetItem("Да" if run.flagged else "Нет")
-
-            for item in [id_item, exp_id_item, time_item, accuracy_item, flagged_item]:
-                item.setFlags(Qt.ItemIsEnabled)
-
-            self.table.setItem(row, 0, id_item)
-            self.table.setItem(row, 1, exp_id_item)
-            self.table.setItem(row, 2, time_item)
-            self.table.setItem(row, 3, accuracy_item)
-            self.table.setItem(row, 4, flagged_item)
-
-            self.add_edit_button(row, run.run_id)
-
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
-
-    def edit_item(self, run_id):
-        run = get_run_by_id(run_id)
-        dialog = EditRunDialog(run, self)
-        if dialog.exec() == QDialog.Accepted:
-            self.load_data()
+    def get_column_modes(self):
+        return [QHeaderView.ResizeToContents, QHeaderView.ResizeToContents, QHeaderView.Stretch,
+                QHeaderView.ResizeToContents, QHeaderView.ResizeToContents, QHeaderView.Stretch]
+
+    def fetch_page(self, after_id, page_size):
+        return get_runs_page(page_size, after_id)
+
+    def fetch_rows(self, ids):
+        return get_runs_by_ids(ids)
+
+    def get_exporter(self):
+        return export_runs
+
+    def row_values(self, run):
+        return run.run_id, (str(run.run_id), str(run.experiment_id), str(run.run_date), str(run.accuracy),
+                            "Да" if run.flagged else "Нет")
+
+    def fetch_item(self, run_id):
+        return get_run_by_id(run_id)
+
+    def create_editor(self, run):
+        return EditRunDialog(run, self)
 
 
 class EditRunDialog(BaseEditDialog):
@@ -397,11 +539,8 @@ class EditRunDialog(BaseEditDialog):
         accuracy = self.accuracy_spin.value()
         flagged = self.verified_checkbox.isChecked()
 
-        try:
-            update_run(experiment_id, self.item.run_id, accuracy, flagged)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить прогон: {str(e)}")
+        self.submit(update_run, experiment_id, self.item.run_id, accuracy, flagged,
+                    on_result=self.on_saved, error_message="Не удалось обновить прогон")
 
     def delete_item(self):
         reply = QMessageBox.question(
@@ -413,14 +552,13 @@ class EditRunDialog(BaseEditDialog):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                delete_run(self.item.run_id)
-                self.accept()
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить прогон: {str(e)}")
+            self.submit(delete_run, self.item.run_id,
+                        on_result=self.on_deleted, error_message="Не удалось удалить прогон")
 
 
 class ImagesTableDialog(BaseTableDialog):
+    table_name = "images"
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Таблица изображений")
@@ -429,6 +567,11 @@ class ImagesTableDialog(BaseTableDialog):
             'file_type': None,
             'attack_type': None
         }
+        # несколько быстрых изменений фильтров дают один запрос
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.apply_filters)
         self.init_filters()
         self.load_data()
 
@@ -441,7 +584,7 @@ class ImagesTableDialog(BaseTableDialog):
         self.sort_id_combo.addItem("Не сортировать", None)
         self.sort_id_combo.addItem("По возрастанию", 'asc')
         self.sort_id_combo.addItem("По убыванию", 'desc')
-        self.sort_id_combo.currentIndexChanged.connect(self.apply_filters)
+        self.sort_id_combo.currentIndexChanged.connect(self.schedule_filters)
         filter_layout.addWidget(self.sort_id_combo)
 
         filter_layout.addWidget(QLabel("Тип файла:"))
@@ -450,7 +593,7 @@ class ImagesTableDialog(BaseTableDialog):
         self.file_type_combo.addItem(".png", ".png")
         self.file_type_combo.addItem(".jpg", ".jpg")
         self.file_type_combo.addItem(".jpeg", ".jpeg")
-        self.file_type_combo.currentIndexChanged.connect(self.apply_filters)
+        self.file_type_combo.currentIndexChanged.connect(self.schedule_filters)
         filter_layout.addWidget(self.file_type_combo)
 
         filter_layout.addWidget(QLabel("Тип атаки:"))
@@ -458,7 +601,7 @@ class ImagesTableDialog(BaseTableDialog):
         self.attack_type_combo.addItem("Все типы", None)
         for attack_type in AttackTypeEnum:
             self.attack_type_combo.addItem(attack_type.value, attack_type.value)
-        self.attack_type_combo.currentIndexChanged.connect(self.apply_filters)
+        self.attack_type_combo.currentIndexChanged.connect(self.schedule_filters)
         filter_layout.addWidget(self.attack_type_combo)
 
         self.reset_btn = QPushButton("Сбросить фильтры")
@@ -468,78 +611,64 @@ class ImagesTableDialog(BaseTableDialog):
         main_layout = self.layout()
         main_layout.insertWidget(0, filter_widget)
 
-    def apply_filters(self):
-        self.filters['sort_id'] = self.sort_id_combo.currentData()
-        self.filters['attack_type'] = self.attack_type_combo.currentData()
-        self.filters['file_type'] = self.file_type_combo.currentData()
+    def schedule_filters(self):
+        self.filter_timer.start()
 
+    def apply_filters(self):
+        self.filter_timer.stop()
+        filters = {
+            'sort_id': self.sort_id_combo.currentData(),
+            'file_type': self.file_type_combo.currentData(),
+            'attack_type': self.attack_type_combo.currentData()
+        }
+        if filters == self.filters:
+            return
+        # новый словарь, а не правка старого: запрос предыдущего состояния мог еще не завершиться
+        self.filters = filters
         self.load_data()
 
     def reset_filters(self):
-        self.sort_id_combo.setCurrentIndex(0)
-        self.attack_type_combo.setCurrentIndex(0)
-        self.file_type_combo.setCurrentIndex(0)
-        self.filters = {
-            'sort_id': None,
-            'file_type': None,
-            'attack_type': None
-        }
-        self.load_data()
+        for combo in (self.sort_id_combo, self.attack_type_combo, self.file_type_combo):
+            combo.blockSignals(True)
+            combo.setCurrentIndex(0)
+            combo.blockSignals(False)
+        self.apply_filters()
+
+    def row_visible(self, image):
+        # путь к файлу не редактируется, поэтому после правки может перестать подходить только тип атаки
+        return not self.filters['attack_type'] or image.attack_type == self.filters['attack_type']
 
     def get_columns(self):
         return ["ID", "ID прогона", "ID эксперимента", "Путь к файлу", "Имя", "Дата добавления", "Координаты", "Тип атаки",
                 "Действия"]
 
-    def load_data(self):
-        result = get_all_images_filtered(self.filters)
-
-        self.table.setColumnCount(len(self.get_columns()))
-        self.table.setHorizontalHeaderLabels(self.get_columns())
-
-        self.table.setRowCount(len(result))
-
-        for row, image in enumerate(result):
-            id_item = QTableWidgetItem(str(image.image_id))
-            run_id_item = QTableWidgetItem(str(image.run_id))
-            experiment_item = QTableWidgetItem(str(getattr(image, 'experiment_id', '')))
-            path_item = QTableWidgetItem(image.file_path)
-            name_item = QTableWidgetItem(image.original_name)
-            date_item = QTableWidgetItem(str(image.added_date))
-            coords_item = QTableWidgetItem(str(image.coordinates))
-            attack_item = QTableWidgetItem(image.attack_type)
-
-            for item in [id_item, run_id_item, experiment_item, path_item, name_item, date_item, coords_item,
-                         attack_item]:
-                item.setFlags(Qt.ItemIsEnabled)
-
-            self.table.setItem(row, 0, id_item)
-            self.table.setItem(row, 1, run_id_item)
-            self.table.setItem(row, 2, experiment_item)
-            self.table.setItem(row, 3, path_item)
-            self.table.setItem(row, 4, name_item)
-            self.table.setItem(row, 5, date_item)
-            self.table.setItem(row, 6, coords_item)
-            self.table.setItem(row, 7, attack_item)
-
-            self.add_edit_button(row, image.image_id)
-
-
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(7, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(8, QHeaderView.Stretch)
-
-    def edit_item(self, image_id):
-        image = get_image_by_id(image_id)
-        dialog = EditImageDialog(image, self)
-        if dialog.exec() == QDialog.Accepted:
-            self.load_data()
+    def get_column_modes(self):
+        return [QHeaderView.ResizeToContents, QHeaderView.ResizeToContents, QHeaderView.ResizeToContents,
+                QHeaderView.Stretch, QHeaderView.Stretch, QHeaderView.ResizeToContents,
+                QHeaderView.ResizeToContents, QHeaderView.ResizeToContents, QHeaderView.Stretch]
+
+    def fetch_page(self, after_id, page_size):
+        return get_images_filtered_page(self.filters, page_size, after_id)
+
+    def fetch_rows(self, ids):
+        return get_images_by_ids(ids, dict(self.filters))
+
+    def is_descending(self):
+        return self.filters['sort_id'] == 'desc'
+
+    def get_exporter(self):
+        return partial(export_images, filters=dict(self.filters))
+
+    def row_values(self, image):
+        return image.image_id, (str(image.image_id), str(image.run_id), str(image.experiment_id),
+                                image.file_path, image.original_name, str(image.added_date),
+                                str(image.coordinates), image.attack_type)
+
+    def fetch_item(self, image_id):
+        return get_image_by_id(image_id)
+
+    def create_editor(self, image):
+        return EditImageDialog(image, self)
 
 
 class EditImageDialog(BaseEditDialog):
@@ -596,11 +725,8 @@ class EditImageDialog(BaseEditDialog):
     def save_changes(self):
         attack_type = self.attack_type_combo.currentData()
         run_id = self.run_id_label.text()
-        try:
-            update_image(self.item.image_id, run_id, attack_type)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить изображение: {str(e)}")
+        self.submit(update_image, self.item.image_id, run_id, attack_type,
+                    on_result=self.on_saved, error_message="Не удалось обновить изображение")
 
     def delete_item(self):
         reply = QMessageBox.question(
@@ -612,8 +738,5 @@ class EditImageDialog(BaseEditDialog):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                delete_image(self.item.image_id)
-                self.accept()
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить изображение: {str(e)}")
\ No newline at end of file
+            self.submit(delete_image, self.item.image_id,
+                        on_result=self.on_deleted, error_message="Не удалось удалить изображение")
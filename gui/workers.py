@@ -0,0 +1,132 @@
+import logging
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Qt
+
+from db.cancel import CancelToken, QueryCancelled, cancel_scope
+
+logger = logging.getLogger(__name__)
+
+
+class DbJob(QRunnable):
+    def __init__(self, runner, key, generation, fn, args, kwargs, token=None):
+        super().__init__()
+        self.runner = runner
+        self.key = key
+        self.generation = generation
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.token = token or CancelToken()
+
+    def run(self):
+        try:
+            with cancel_scope(self.token):
+                result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self._emit(self.runner.job_failed, e)
+            return
+        self._emit(self.runner.job_finished, result)
+
+    def _emit(self, signal, payload):
+        try:
+            signal.emit(self.key, self.generation, payload)
+        except RuntimeError:
+            pass
+
+
+class JobRunner(QObject):
+    job_finished = Signal(object, int, object)
+    job_failed = Signal(object, int, object)
+    job_progress = Signal(object, int, object)
+    busy_changed = Signal(bool)
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self._pool = pool or QThreadPool.globalInstance()
+        self._generations = {}
+        self._callbacks = {}
+        self._tokens = {}
+        self._cancelled = set()
+        self.job_finished.connect(self._on_finished, Qt.QueuedConnection)
+        self.job_failed.connect(self._on_failed, Qt.QueuedConnection)
+        self.job_progress.connect(self._on_progress, Qt.QueuedConnection)
+
+    def submit(self, key, fn, *args, on_result=None, on_error=None, on_progress=None, cancellable=False, **kwargs):
+        # cancellable - только для чтения: такой запрос прерывается на сервере, когда его заменяет новый
+        self._cancel_stale(key)
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+        if on_progress is not None:
+            kwargs['progress'] = lambda value: self.job_progress.emit(key, generation, value)
+
+        was_busy = self.is_busy()
+        self._callbacks[(key, generation)] = (on_result, on_error, on_progress)
+        if not was_busy:
+            self.busy_changed.emit(True)
+        token = CancelToken()
+        if cancellable:
+            self._tokens[(key, generation)] = token
+        self._pool.start(DbJob(self, key, generation, fn, args, kwargs, token))
+        return generation
+
+    def discard(self, key):
+        self._cancel_stale(key)
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _cancel_stale(self, key):
+        # результат прошлого запроса с этим ключом все равно будет отброшен - останавливаем его на сервере;
+        # on_error такого запроса получит QueryCancelled, остальные устаревшие запросы доработают молча;
+        # token.cancel() не ждет ответа сервера, запрос отмены уходит из своего потока
+        for job_key, token in list(self._tokens.items()):
+            if job_key[0] == key:
+                token.cancel()
+                del self._tokens[job_key]
+                self._cancelled.add(job_key)
+
+    def is_busy(self, key=None):
+        if key is None:
+            return bool(self._callbacks)
+        return any(k == key for k, _ in self._callbacks)
+
+    def bind_busy_cursor(self, widget):
+        self.busy_changed.connect(lambda busy: widget.setCursor(Qt.BusyCursor) if busy else widget.unsetCursor())
+
+    def _is_current(self, key, generation):
+        return self._generations.get(key) == generation
+
+    def _pop(self, key, generation):
+        self._tokens.pop((key, generation), None)
+        callbacks = self._callbacks.pop((key, generation), (None, None, None))
+        if not self._callbacks:
+            self.busy_changed.emit(False)
+        return callbacks
+
+    def _on_finished(self, key, generation, result):
+        on_result, on_error, _ = self._pop(key, generation)
+        if (key, generation) in self._cancelled:
+            self._report_cancelled(key, generation, on_error)
+        elif on_result is not None and self._is_current(key, generation):
+            on_result(result)
+
+    def _on_failed(self, key, generation, error):
+        _, on_error, _ = self._pop(key, generation)
+        if (key, generation) in self._cancelled:
+            self._report_cancelled(key, generation, on_error)
+            return
+        if not self._is_current(key, generation):
+            return
+        if on_error is not None:
+            on_error(error)
+        else:
+            logger.error(f"ошибка фонового запроса {key}: {error}")
+
+    def _report_cancelled(self, key, generation, on_error):
+        # запрос мог успеть завершиться до отмены - для вызывающего он все равно отменен
+        self._cancelled.discard((key, generation))
+        if on_error is not None:
+            on_error(QueryCancelled("запрос отменен"))
+
+    def _on_progress(self, key, generation, value):
+        callbacks = self._callbacks.get((key, generation))
+        if callbacks and callbacks[2] is not None and self._is_current(key, generation):
+            callbacks[2](value)
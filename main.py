@@ -5,10 +5,14 @@ from gui.logger_widget import setup_logging
 from gui.main_window import MainWindow
 
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+def create_main_window():
     setup_logging()
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
+    return window
+
 
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = create_main_window()
+    sys.exit(app.exec())